@@ -1,14 +1,30 @@
 import os
 import json
-import random
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from functools import lru_cache
 from dotenv import load_dotenv
-from spotipy import Spotify
-from spotipy.oauth2 import SpotifyOAuth
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from lyricsgenius import Genius
+from scanner import (RateLimiter, discover_releases, queue_releases, collect_releases, collect_credits,
+                     record_releases, iter_pages, parse_release_date, DEFAULT_WORKERS)
+from state_store import StateStore, DEFAULT_STATE_PATH
+from genius_cache import GeniusCache
+from enrichment import EnrichmentStage, spawn
+from batching import SpotifyBatcher, print_request_report
+from playlist_writer import PlaylistWriter
+from instrumentation import RunReport, DEFAULT_REPORT_PATH
+from profiles import Profile, load_profiles, unique_by_id
+from report_renderer import render_report
+from mailer import Mailer, build_message
+from catalog_store import CatalogStore, DEFAULT_CATALOG_STORE_PATH
+from rotation import Rotation
+from recommender import Recommender
+from releases import Track
+from release_feed import feed_discoveries, feed_matches
+from checkpoint import Checkpoint, run_key, ARTIST_BATCH, DEFAULT_CHECKPOINT_DIR
+from scheduler import PollScheduler, DetectionBuffer, last_digest_time
 
 # Charger les variables d'environnement depuis .env à la racine ou secrets/.env en local
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -22,55 +38,257 @@ EMAIL_USER = os.getenv("EMAIL_USER")           # ton email Outlook
 EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")   # mot de passe App
 EMAIL_TO = os.getenv("EMAIL_TO")               # email destinataire
 SEND_EMAIL = True                              # True/False selon si on envoie l'email
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")  # serveur d'envoi
+SMTP_PORT = int(os.getenv("SMTP_PORT", 587))
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "true").lower() == "true"  # false pour un SMTP local sans TLS
+SCAN_WORKERS = int(os.getenv("SCAN_WORKERS", DEFAULT_WORKERS))  # threads pour le scan des artistes
+RELEASE_FEED = os.getenv("RELEASE_FEED", "false").lower() == "true"  # détection par le flux des nouveautés
+SPOTIFY_MARKET = os.getenv("SPOTIFY_MARKET", "FR")  # marché du flux des nouveautés et des découvertes
+STATE_PATH = DEFAULT_STATE_PATH                # sorties déjà signalées (env STATE_PATH)
+CATALOG_DIR = os.getenv("CATALOG_DIR", BASE_DIR)  # artists.json, podcasts.json et les catalogues Rolling Stone
+CATALOG_STORE_PATH = DEFAULT_CATALOG_STORE_PATH  # catalogues précalculés (env CATALOG_STORE_PATH)
+CHECKPOINT_DIR = DEFAULT_CHECKPOINT_DIR         # points de reprise du run en cours (env CHECKPOINT_DIR)
+PREVIEW_PATH = os.path.join(BASE_DIR, "preview.html")  # aperçu du mail en --dry-run / --offline
+REPORT_PATH = DEFAULT_REPORT_PATH               # rapport JSON du run (env RUN_REPORT_PATH)
+REPORT_IN_EMAIL = os.getenv("REPORT_IN_EMAIL", "false").lower() == "true"  # résumé des temps en pied de mail
+DAEMON_TICK = int(os.getenv("DAEMON_TICK", 60))                # secondes entre deux ticks du mode service
+DAEMON_DIGEST_AT = os.getenv("DAEMON_DIGEST_AT", "FRI 07:00")  # échéance du mail de la semaine (heure locale)
+DAEMON_ALERTS = os.getenv("DAEMON_ALERTS", "false").lower() == "true"  # alerte par mail dès qu'une sortie est détectée
+DAEMON_RETRY = 900                                             # secondes avant de retenter un mail de la semaine raté
+DAEMON_FEED_EVERY = int(os.getenv("DAEMON_FEED_EVERY", 900))   # avec RELEASE_FEED : secondes entre deux lectures du flux
 
-# Spotify OAuth
-auth_manager = SpotifyOAuth(
-    client_id=os.getenv("SPOTIPY_CLIENT_ID"),
-    client_secret=os.getenv("SPOTIPY_CLIENT_SECRET"),
-    redirect_uri=os.getenv("SPOTIPY_REDIRECT_URI"),
-    scope="playlist-modify-private playlist-modify-public",
-    cache_path=".cache-spotify"
-)
-auth_manager.refresh_access_token(os.getenv("SPOTIPY_REFRESH_TOKEN"))
-
-sp = Spotify(auth_manager=auth_manager)
-
-# Genius API - Gérer le cas où le token n'est pas défini
-genius_token = os.getenv("GENIUS_ACCESS_TOKEN")
-if genius_token:
-    genius = Genius(genius_token, verbose=False, remove_section_headers=True, timeout=15)
-else:
-    print("⚠️ GENIUS_ACCESS_TOKEN non défini - fonctionnalités Genius désactivées")
-    genius = None
-
-
-# Vérifier la connexion
-me = sp.current_user()
-print(f"✅ Connecté à Spotify en tant que : {me['display_name']}")
-
-with open(os.path.join(BASE_DIR, "artists.json"), "r") as f:
-    ARTISTS = json.load(f)
-
-# Charger les podcasts (optionnel)
-PODCASTS = []
-podcasts_path = os.path.join(BASE_DIR, "podcasts.json")
-if os.path.exists(podcasts_path):
-    with open(podcasts_path, "r") as pf:
-        PODCASTS = json.load(pf)
-
-# Charger les classiques hip-hop (200 albums Rolling Stone)
-CLASSICS_HIPHOP = []
-classics_hiphop_path = os.path.join(BASE_DIR, "classics_hiphop.json")
-if os.path.exists(classics_hiphop_path):
-    with open(classics_hiphop_path, "r") as cf:
-        CLASSICS_HIPHOP = json.load(cf)
-
-# Charger les meilleurs sons du 21e siècle (Rolling Stone)
-BEST_SONGS = []
-best_songs_path = os.path.join(BASE_DIR, "best_songs_21st_century.json")
-if os.path.exists(best_songs_path):
-    with open(best_songs_path, "r") as bs:
-        BEST_SONGS = json.load(bs)
+
+# ----- Clients Spotify / Genius, créés au premier usage -----
+class Clients:
+    """
+    Construit les clients à la demande : rien n'est importé, rafraîchi ni
+    appelé tant qu'une étape n'en a pas besoin. En mode hors-ligne, aucun
+    client réseau n'est créé.
+    """
+
+    def __init__(self, offline=False, refresh_token_env="SPOTIPY_REFRESH_TOKEN", cache_path=".cache-spotify",
+                 http=None):
+        self.offline = offline
+        self.refresh_token_env = refresh_token_env  # chaque profil rafraîchit son propre token
+        self.cache_path = cache_path
+        self._http = http
+        self._sp = None
+        self._me = None
+        self._genius = None
+        self._genius_ready = False
+        self._genius_cache = None
+        # Genius et son cache sont utilisés pour la première fois depuis les workers d'EnrichmentStage
+        self._lock = threading.Lock()
+
+    @property
+    def http(self):
+        """Pool de connexions partagé par Spotify et Genius."""
+        if self._http is None:
+            from http_pool import HttpPool
+            self._http = HttpPool()
+        return self._http
+
+    @property
+    def sp(self):
+        if self._sp is None:
+            if self.offline:
+                raise RuntimeError("client Spotify indisponible en mode hors-ligne")
+            from spotipy import Spotify
+            from spotipy.oauth2 import SpotifyOAuth
+
+            # Spotify OAuth
+            auth_manager = SpotifyOAuth(
+                client_id=os.getenv("SPOTIPY_CLIENT_ID"),
+                client_secret=os.getenv("SPOTIPY_CLIENT_SECRET"),
+                redirect_uri=os.getenv("SPOTIPY_REDIRECT_URI"),
+                scope="playlist-modify-private playlist-modify-public",
+                cache_path=self.cache_path
+            )
+            auth_manager.refresh_access_token(os.getenv(self.refresh_token_env))
+
+            self._sp = Spotify(auth_manager=auth_manager, requests_session=self.http.session())
+        return self._sp
+
+    @property
+    def me(self):
+        """Utilisateur Spotify connecté, récupéré une seule fois par run."""
+        if self._me is None:
+            self._me = self.sp.current_user()
+            print(f"✅ Connecté à Spotify en tant que : {self._me['display_name']}")
+        return self._me
+
+    @property
+    def genius(self):
+        """Client Genius, ou None si le token n'est pas défini (ou en mode hors-ligne)."""
+        with self._lock:
+            if not self._genius_ready:
+                self._init_genius()
+        return self._genius
+
+    def _init_genius(self):
+        self._genius_ready = True
+        # Genius API - Gérer le cas où le token n'est pas défini
+        genius_token = os.getenv("GENIUS_ACCESS_TOKEN")
+        if self.offline:
+            self._genius = None
+        elif genius_token:
+            from lyricsgenius import Genius
+            self._genius = Genius(genius_token, verbose=False, remove_section_headers=True, timeout=15)
+            # Garder la session Genius (et ses headers) mais la brancher sur le pool partagé
+            self.http.mount(self._genius._session)
+        else:
+            print("⚠️ GENIUS_ACCESS_TOKEN non défini - fonctionnalités Genius désactivées")
+
+    @property
+    def genius_cache(self):
+        """Cache disque des recherches Genius (TTL, résultats négatifs, éviction LRU), un seul par run."""
+        with self._lock:
+            if self._genius_cache is None:
+                self._genius_cache = GeniusCache()
+            return self._genius_cache
+
+    def close_genius_cache(self):
+        """Ferme le cache Genius en fin de run (rouvert au besoin par le run suivant du mode service)."""
+        with self._lock:
+            if self._genius_cache is not None:
+                self._genius_cache.close()
+                self._genius_cache = None
+
+
+clients = Clients()
+
+
+@lru_cache(maxsize=None)
+def load_catalog(filename):
+    """Charge un fichier JSON de CATALOG_DIR (liste vide s'il n'existe pas), une seule fois par process."""
+    path = os.path.join(CATALOG_DIR, filename)
+    if not os.path.exists(path):
+        return []
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+# Catalogues tirés chaque semaine : nom -> (type Spotify, champ du titre)
+CATALOGS = {
+    'classics_hiphop': ('album', 'album'),            # 200 albums Rolling Stone
+    'best_songs_21st_century': ('track', 'song'),     # meilleurs sons du 21e siècle (Rolling Stone)
+}
+PICKS_PER_WEEK = 3  # classiques et sons du siècle envoyés chaque semaine
+BUILD_CHUNK = 1000  # entrées résolues par passe lors de --build-catalogs (mémoire bornée)
+
+
+def open_catalog(catalog_store, name, k):
+    """
+    Retourne (taille, lecture) d'un catalogue, `lecture` donnant les entrées à
+    des positions : depuis le store précalculé s'il a été construit (URL, URI
+    et Genius déjà connus, aucun appel réseau), sinon depuis le fichier JSON
+    (entrées résolues pendant le run).
+    """
+    if catalog_store is not None and catalog_store.size(name) >= k:
+        return catalog_store.size(name), lambda positions: catalog_store.get(name, positions)
+    entries = load_catalog(f"{name}.json")
+    return len(entries), lambda positions: [entries[position] for position in positions]
+
+
+def select_entries(catalog_store, rotation, name, k=PICKS_PER_WEEK):
+    """Les k prochaines entrées du catalogue dans sa rotation (pas de répétition avant d'en avoir fait le tour)."""
+    size, read = open_catalog(catalog_store, name, k)
+    return read(rotation.take(name, size, k))
+
+
+def upcoming_entries(catalog_store, rotation, name, weeks, k=PICKS_PER_WEEK):
+    """Entrées des `weeks` prochains tirages, sans avancer la rotation."""
+    size, read = open_catalog(catalog_store, name, k)
+    return [entry for positions in rotation.peek(name, size, k, weeks) for entry in read(positions)]
+
+
+def enrich_entries(catalog_store, name, entries):
+    """
+    Enrichit des entrées de catalogue via Genius (cache disque compris) et
+    garde le résultat dans le store des catalogues pour les entrées qui en
+    viennent. Retourne le nombre d'entrées enrichies.
+    """
+    kind, title_field = CATALOGS[name]
+    lookup = get_album_genius_info if kind == 'album' else get_song_genius_info
+    enriched = 0
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        infos = pool.map(lambda entry: lookup(entry[title_field], entry['artist']), entries)
+        for entry, info in zip(entries, infos):
+            if info:
+                enriched += 1
+                if catalog_store is not None and 'position' in entry:
+                    catalog_store.set_genius(name, entry['position'], info)
+    return enriched
+
+
+def build_catalogs(with_genius=False):
+    """
+    Construit le store des catalogues depuis les fichiers JSON : URL et URI
+    Spotify résolus par paquets (les IDs introuvables sont écartés), puis
+    avec `with_genius` l'enrichissement Genius de toutes les entrées qui ne
+    l'ont pas encore.
+    """
+    store = CatalogStore(CATALOG_STORE_PATH)
+    limiter = RateLimiter()
+    for name, (kind, _) in CATALOGS.items():
+        entries = load_catalog(f"{name}.json")
+        if not entries:
+            print(f"⚠️ Catalogue {name} : fichier {name}.json vide ou absent")
+            continue
+
+        def resolved_rows():
+            for start in range(0, len(entries), BUILD_CHUNK):
+                chunk = [entry for entry in entries[start:start + BUILD_CHUNK] if entry.get('id')]
+                batcher = SpotifyBatcher(clients.sp, limiter, workers=SCAN_WORKERS)
+                ids = [entry['id'] for entry in chunk]
+                batcher.queue_albums(ids) if kind == 'album' else batcher.queue_tracks(ids)
+                batcher.resolve()
+                for entry in chunk:
+                    try:
+                        item = batcher.album(entry['id']) if kind == 'album' else batcher.track(entry['id'])
+                    except LookupError as e:
+                        print(f"  ⚠️ {name} : entrée ignorée ({e})")
+                        continue
+                    yield entry, item.url, item.uri
+
+        size = store.replace(name, resolved_rows())
+        print(f"📚 Catalogue {name} : {size}/{len(entries)} entrée(s) précalculée(s)")
+
+    if with_genius and clients.genius:
+        for name in CATALOGS:
+            pending = store.missing_genius(name)
+            enriched = enrich_entries(store, name, pending)
+            print(f"🧠 Catalogue {name} : {enriched}/{len(pending)} entrée(s) enrichie(s) par Genius")
+    store.close()
+    clients.close_genius_cache()
+    print(f"Requêtes Spotify : {sum(limiter.calls.values())}")
+
+
+def warm(weeks=1):
+    """
+    Prépare la veille les classiques et sons des `weeks` prochains runs : leur
+    enrichissement Genius est mis en cache (et gardé dans le store des
+    catalogues), le run du lendemain n'a plus qu'à le relire. Leurs URL et URI
+    Spotify viennent déjà du store (`--build-catalogs`). La rotation n'avance pas.
+    """
+    if not clients.genius:
+        return
+    catalog_store = CatalogStore.open_existing(CATALOG_STORE_PATH)
+    if catalog_store is None:
+        print("ℹ️ Pas de store des catalogues (python app.py --build-catalogs) : "
+              "les URL et URI Spotify seront résolus pendant le run")
+    rotation = Rotation(STATE_PATH)
+    for name in CATALOGS:
+        pending = [entry for entry in upcoming_entries(catalog_store, rotation, name, weeks)
+                   if entry.get('genius_info') is None]
+        enriched = enrich_entries(catalog_store, name, pending)
+        print(f"🔥 {name} : {enriched}/{len(pending)} entrée(s) des {weeks} prochain(s) tirage(s) "
+              f"enrichie(s) par Genius")
+    print(f"🧠 Cache Genius : {clients.genius_cache.summary()}")
+    rotation.close()
+    clients.close_genius_cache()
+    if catalog_store is not None:
+        catalog_store.close()
 
 
 # ----- Fonction pour récupérer les infos Genius sur un album -----
@@ -78,11 +296,23 @@ def get_album_genius_info(album_name, artist_name):
     """
     Récupère les informations contextuelles d'un album depuis Genius.
     Retourne un dictionnaire avec description, producteurs, faits marquants, etc.
+    Les résultats sont servis depuis le cache disque tant qu'ils sont valides.
     """
-    if not genius:
+    if not clients.genius:
         return None
     
+    try:
+        return clients.genius_cache.fetch('album', album_name, artist_name,
+                                  lambda: _search_album_genius_info(album_name, artist_name))
+    except Exception as e:
+        print(f"  ⚠️ Erreur Genius générale pour {album_name} - {artist_name}: {e}")
+        return None
+
+
+def _search_album_genius_info(album_name, artist_name):
+    """Interroge Genius pour un album. Retourne (infos, complet) pour le cache."""
     import re
+    genius = clients.genius
     
     def format_for_genius_url(text):
         """Formate un texte pour une URL Genius (ex: 'The Blueprint' -> 'The-blueprint')"""
@@ -92,21 +322,21 @@ def get_album_genius_info(album_name, artist_name):
         text = re.sub(r'\s+', '-', text)
         return text.lower()  # Utiliser lower() au lieu de capitalize()
     
-    try:
-        # Construire l'URL de l'album directement (format Genius standard)
-        artist_formatted = format_for_genius_url(artist_name)
-        album_formatted = format_for_genius_url(album_name)
-        album_url = f"https://genius.com/albums/{artist_formatted}/{album_formatted}"
-        
-        # Construire les informations de base
-        info = {
-            'url': album_url,  # URL directe vers l'album sur Genius
-            'description': '',
-            'release_date': '',
-            'facts': []
-        }
-        
-        # Rechercher une chanson de l'album pour avoir des informations contextuelles
+    # Construire l'URL de l'album directement (format Genius standard)
+    artist_formatted = format_for_genius_url(artist_name)
+    album_formatted = format_for_genius_url(album_name)
+    album_url = f"https://genius.com/albums/{artist_formatted}/{album_formatted}"
+    
+    # Construire les informations de base
+    info = {
+        'url': album_url,  # URL directe vers l'album sur Genius
+        'description': '',
+        'release_date': '',
+        'facts': []
+    }
+    
+    # Rechercher une chanson de l'album pour avoir des informations contextuelles
+    def search_facts():
         try:
             song = genius.search_song(album_name, artist_name)
             
@@ -124,8 +354,11 @@ def get_album_genius_info(album_name, artist_name):
                     print(f"  ⚠️ Erreur annotation Genius pour {album_name}: {e}")
         except Exception as e:
             print(f"  ⚠️ Erreur recherche chanson Genius pour {album_name}: {e}")
-        
-        # Récupérer la description de l'artiste (séparé pour éviter de bloquer tout)
+            return False
+        return True
+    
+    # Récupérer la description de l'artiste (séparé pour éviter de bloquer tout)
+    def search_description():
         try:
             artist = genius.search_artist(artist_name, max_songs=0, get_full_info=True)
             if artist and artist.description:
@@ -133,11 +366,17 @@ def get_album_genius_info(album_name, artist_name):
                 info['description'] = desc.split('\n')[0] if desc else ''
         except Exception as e:
             print(f"  ⚠️ Erreur recherche artiste Genius pour {artist_name}: {e}")
-        
-        return info
-    except Exception as e:
-        print(f"  ⚠️ Erreur Genius générale pour {album_name} - {artist_name}: {e}")
-        return None
+            return False
+        return True
+    
+    # Les deux recherches sont indépendantes : les lancer en parallèle (thread démon,
+    # pour qu'une recherche abandonnée à l'échéance ne retienne pas la fin du process)
+    description_ok = spawn(search_description)
+    facts_ok = search_facts()
+    # Si une recherche échoue, le résultat partiel n'est pas mis en cache
+    complete = facts_ok and description_ok.result()
+    
+    return info, complete
 
 
 # ----- Fonction pour récupérer les infos Genius sur une chanson -----
@@ -145,190 +384,218 @@ def get_song_genius_info(song_name, artist_name):
     """
     Récupère les informations contextuelles d'une chanson depuis Genius.
     Retourne un dictionnaire avec description, annotations, et URL Genius.
+    Les résultats (y compris « non trouvée ») sont servis depuis le cache disque.
     """
-    if not genius:
+    if not clients.genius:
         return None
     
     try:
-        # Rechercher la chanson sur Genius
-        song = genius.search_song(song_name, artist_name)
-        if not song:
-            print(f"  ℹ️ Chanson '{song_name}' de {artist_name} non trouvée sur Genius")
-            return None
-        
-        # Construire les informations
-        info = {
-            'url': song.url,
-            'release_date': song.release_date if hasattr(song, 'release_date') else '',
-        }
-        
-        # Extraire des faits marquants depuis les annotations
-        facts = []
-        try:
-            if hasattr(song, 'description_annotation') and song.description_annotation:
-                desc = song.description_annotation.get('annotations', [{}])[0].get('body', {}).get('plain', '')
-                if desc and len(desc) > 50:
-                    facts.append(desc[:200] + "..." if len(desc) > 200 else desc)
-        except Exception as e:
-            print(f"  ⚠️ Erreur extraction annotations pour {song_name}: {e}")
-        
-        info['facts'] = facts
-        
-        return info
+        return clients.genius_cache.fetch('song', song_name, artist_name,
+                                  lambda: _search_song_genius_info(song_name, artist_name))
     except Exception as e:
         print(f"  ⚠️ Erreur Genius pour {song_name} - {artist_name}: {e}")
         return None
 
 
-# ----- Déterminer la semaine passée -----
-today = datetime.today()
-last_week = today - timedelta(days=7)
-
-# ----- Chercher les nouvelles sorties -----
-new_tracks_set = set()
-music_releases = []
-podcast_releases = []
-errors_list = []
-playlist_url = None
-
-for artist in ARTISTS:
-    artist_name = artist['artist']
-    artist_id = artist['id']
+def _search_song_genius_info(song_name, artist_name):
+    """Interroge Genius pour une chanson. Retourne (infos ou None, complet) pour le cache."""
+    genius = clients.genius
+    # Rechercher la chanson sur Genius
+    song = genius.search_song(song_name, artist_name)
+    if not song:
+        print(f"  ℹ️ Chanson '{song_name}' de {artist_name} non trouvée sur Genius")
+        return None, True  # résultat négatif, mis en cache lui aussi
+    
+    # Construire les informations
+    info = {
+        'url': song.url,
+        'release_date': song.release_date if hasattr(song, 'release_date') else '',
+    }
+    
+    # Extraire des faits marquants depuis les annotations
+    facts = []
     try:
-        albums = sp.artist_albums(artist_id, album_type='album,single', limit=50)
-        for album in albums['items']:
-            release_date = album['release_date']
-            if len(release_date) == 10:
-                release_dt = datetime.strptime(release_date, "%Y-%m-%d")
-            else:
-                release_dt = datetime.strptime(release_date, "%Y")
-            if release_dt >= last_week:
-                for track in sp.album_tracks(album['id'])['items']:
-                    new_tracks_set.add(track['uri'])
-                    # Formatage texte pour le mail
-                    if album['album_type'] == 'album':
-                        music_releases.append(f"{artist_name} - {album['name']} [Album]")
-                    else:
-                        music_releases.append(f"{artist_name} - {track['name']}")
-                        
+        if hasattr(song, 'description_annotation') and song.description_annotation:
+            desc = song.description_annotation.get('annotations', [{}])[0].get('body', {}).get('plain', '')
+            if desc and len(desc) > 50:
+                facts.append(desc[:200] + "..." if len(desc) > 200 else desc)
     except Exception as e:
-        errors_list.append(f"{artist_name}: {str(e)}")
-        print(f"⚠️ Erreur pour {artist_name}: {e}")
+        print(f"  ⚠️ Erreur extraction annotations pour {song_name}: {e}")
+    
+    info['facts'] = facts
+    
+    return info, True
+
 
 # ----- Chercher nouveaux épisodes de podcasts (shows) -----
-for show in PODCASTS:
-    show_name = show.get('podcast')
-    show_id = show.get('id')
-    if not show_id:
-        print(f"⚠️ Pas d'ID pour le podcast '{show_name}'")
-        continue
-    try:
-        episodes = sp.show_episodes(show_id, limit=50)
-        # Filtrer les épisodes de la semaine passée et trier par date (plus récent d'abord)
-        week_episodes = []
-        for ep in episodes.get('items', []):
-            release_date = ep.get('release_date')
-            if not release_date:
-                continue
-            if len(release_date) == 10:
-                release_dt = datetime.strptime(release_date, "%Y-%m-%d")
-            else:
-                release_dt = datetime.strptime(release_date, "%Y")
-            if release_dt >= last_week:
+def scan_shows(sp, shows, since, limiter, state):
+    """
+    Cherche le dernier épisode de la semaine de chaque podcast.
+    Retourne une liste de (show, épisode ou None, erreur ou None), dans l'ordre de `shows`.
+    """
+    results = []
+    for show in shows:
+        show_name = show.get('podcast')
+        show_id = show.get('id')
+        if not show_id:
+            print(f"⚠️ Pas d'ID pour le podcast '{show_name}'")
+            continue
+        try:
+            # Épisodes du plus récent au plus ancien, pages suivantes chargées à la demande :
+            # une petite première page suffit pour une semaine, la pagination fait le reste
+            episodes = iter_pages(sp, limiter, limiter.call(sp.show_episodes, show_id, limit=10))
+            # Garder les épisodes de la semaine passée et trier par date (plus récent d'abord)
+            week_episodes = []
+            for ep in episodes:
+                # Arrêt au premier épisode déjà signalé ou trop ancien : inutile de paginer plus loin
+                if state.is_known('show', show_id, ep.get('id')):
+                    break
+                release_date = ep.get('release_date')
+                if not release_date:
+                    continue
+                release_dt = parse_release_date(release_date)
+                if release_dt < since:
+                    break
                 week_episodes.append((release_dt, ep))
-        
-        # Prendre seulement le plus récent (limit 1 par podcast)
-        if week_episodes:
-            week_episodes.sort(key=lambda x: x[0], reverse=True)
-            release_dt, ep = week_episodes[0]
-            uri = ep.get('uri')
+
+            # Mémoriser tous les épisodes de la semaine pour ne pas renvoyer les plus
+            # anciens au prochain run, mais ne prendre que le plus récent (limit 1 par podcast)
+            state.record('show', show_id, [(ep.get('id'), ep.get('release_date')) for _, ep in week_episodes])
+            latest = None
+            if week_episodes:
+                week_episodes.sort(key=lambda x: x[0], reverse=True)
+                latest = week_episodes[0][1]
+            results.append((show, latest, None))
+        except Exception as e:
+            print(f"⚠️ Erreur pour le show {show_name}: {e}")
+            results.append((show, None, str(e)))
+    return results
+
+
+def collect_podcasts(show_results):
+    """
+    Retourne (podcast_releases, errors_list) ; podcast_releases contient des
+    tuples (show_name, episode_name) pour pouvoir formater séparément.
+    """
+    podcast_releases = []
+    errors_list = []
+    for show, episode, error in show_results:
+        if error:
+            errors_list.append(f"{show.get('podcast')}: {error}")
+        elif episode:
             # Ne pas ajouter à la playlist, seulement au mail
-            # Stocker comme tuple (show_name, episode_name) pour pouvoir formater séparément
-            podcast_releases.append((show_name, ep.get('name')))
-    except Exception as e:
-        errors_list.append(f"{show_name}: {str(e)}")
-        print(f"⚠️ Erreur pour le show {show_name}: {e}")
+            podcast_releases.append((show.get('podcast'), episode.get('name')))
+    return podcast_releases, errors_list
+
 
 # ----- Obtenir des recommandations basées sur les nouvelles sorties -----
-recommendations = []
-if new_tracks_set and len(new_tracks_set) > 0:
-    try:
-        # Prendre jusqu'à 5 tracks comme seeds pour les recommandations
-        seed_tracks = list(new_tracks_set)[:min(5, len(new_tracks_set))]
-        # Extraire juste l'ID depuis l'URI (format: spotify:track:ID)
-        seed_track_ids = [uri.split(':')[-1] for uri in seed_tracks]
-        
-        recs = sp.recommendations(seed_tracks=seed_track_ids, limit=3)
-        for track in recs['tracks']:
-            artist_names = ', '.join([artist['name'] for artist in track['artists']])
-            recommendations.append(f"{artist_names} - {track['name']}")
-    except Exception as e:
-        print(f"⚠️ Erreur lors de la récupération des recommandations: {e}")
+DISCOVERIES = 3            # morceaux de la section « Découvertes »
+DISCOVERY_CANDIDATES = 6   # artistes proposés par le recommandeur (un appel `artist_top_tracks` chacun au plus)
+
 
-# ----- Sélectionner 3 albums classiques hip-hop et 3 chansons aléatoires -----
-classics_of_week = []
-songs_of_week = []
-songs_uris = []  # URIs des chansons du siècle pour la playlist
+def get_recommendations(sp, new_tracks, limiter, recommender=None, discoveries=(), followed=(), store=None):
+    """
+    Découvertes de la semaine : les artistes non suivis les plus proches des
+    artistes qui ont sorti quelque chose (recommandeur local), et pour chacun
+    son morceau le plus écouté pas encore passé par une playlist du bot (ni
+    cette semaine, ni une sortie déjà signalée d'un artiste suivi). Sans
+    historique ni candidat, la section reste vide.
+    """
+    recommendations = []
+    if not new_tracks or recommender is None:
+        return recommendations
+    seeds = {artist['id']: len(recent) for artist, recent, _ in discoveries if recent}
+    exclude = set(new_tracks)
+    for artist_id, artist_name in recommender.recommend(seeds, followed, k=DISCOVERY_CANDIDATES):
+        try:
+            tracks = limiter.call(sp.artist_top_tracks, artist_id, country=SPOTIFY_MARKET)['tracks']
+        except Exception as e:
+            print(f"⚠️ Erreur lors de la récupération des titres de {artist_name}: {e}")
+            continue
+        for track in tracks:
+            album_id = (track.get('album') or {}).get('id')
+            track = Track.from_json(track)
+            if track.uri in exclude or recommender.reported(track.uri):
+                continue
+            if store is not None and any(store.is_known('artist', credit_id, album_id)
+                                         for credit_id, _ in track.artists):
+                continue
+            recommendations.append(f"{', '.join(name for _, name in track.artists)} - {track.name}")
+            break
+        if len(recommendations) == DISCOVERIES:
+            break
+    return recommendations
 
-# Utiliser la semaine de l'année pour le nom de la playlist
-week_number = today.isocalendar()[1]
 
-# Sélectionner 3 albums classiques aléatoires (vraiment aléatoire, pas de seed fixe)
-if CLASSICS_HIPHOP and len(CLASSICS_HIPHOP) >= 3:
-    selected_classics = random.sample(CLASSICS_HIPHOP, 3)
+# ----- Classiques hip-hop et sons du siècle de la semaine -----
+def build_classics(selected_classics, batcher=None):
+    """
+    Construit les entrées du mail pour les classiques tirés. Les entrées du
+    store des catalogues ont déjà leur URL ; sinon elle vient du batcher, ou
+    sans batcher (mode hors-ligne) elle est construite depuis l'ID.
+    """
+    classics_of_week = []
     for classic in selected_classics:
         try:
-            album_info = sp.album(classic['id'])
-            
-            # Récupérer les infos Genius pour contexte enrichi
-            genius_info = get_album_genius_info(classic['album'], classic['artist'])
-            
+            if classic.get('url'):
+                url = classic['url']
+            elif batcher:
+                url = batcher.album(classic['id']).url
+            else:
+                url = f"https://open.spotify.com/album/{classic['id']}"
             classics_of_week.append({
+                'id': classic['id'],
                 'album': classic['album'],
                 'artist': classic['artist'],
                 'year': classic['year'],
-                'url': album_info['external_urls']['spotify'],
-                'genius_info': genius_info  # Ajout des infos Genius
+                'url': url,
+                'genius_info': classic.get('genius_info')  # Sinon rempli par l'étape d'enrichissement Genius
             })
             # Ne plus ajouter les albums classiques à la playlist (seulement dans l'email)
         except Exception as e:
             print(f"⚠️ Erreur lors de la récupération du classique {classic['album']}: {e}")
+    return classics_of_week
+
 
-# Sélectionner 3 chansons aléatoires du 21e siècle
-if BEST_SONGS and len(BEST_SONGS) >= 3:
-    selected_songs = random.sample(BEST_SONGS, 3)
+def build_songs(selected_songs, batcher=None):
+    """Comme build_classics, pour les sons du siècle. Retourne (songs_of_week, songs_uris)."""
+    songs_of_week = []
+    songs_uris = []  # URIs des chansons du siècle pour la playlist
     for song in selected_songs:
         try:
-            track_info = sp.track(song['id'])
-            
-            # Récupérer les infos Genius pour contexte enrichi
-            genius_info = get_song_genius_info(song['song'], song['artist'])
-            
+            if song.get('uri'):
+                url, uri = song['url'], song['uri']
+            elif batcher:
+                track = batcher.track(song['id'])
+                url, uri = track.url, track.uri
+            else:
+                url, uri = f"https://open.spotify.com/track/{song['id']}", f"spotify:track:{song['id']}"
             songs_of_week.append({
+                'id': song['id'],
                 'song': song['song'],
                 'artist': song['artist'],
                 'year': song['year'],
-                'url': track_info['external_urls']['spotify'],
-                'genius_info': genius_info  # Ajout des infos Genius
+                'url': url,
+                'genius_info': song.get('genius_info')  # Sinon rempli par l'étape d'enrichissement Genius
             })
             # Ajouter l'URI de la chanson pour la playlist
-            songs_uris.append(track_info['uri'])
+            songs_uris.append(uri)
         except Exception as e:
             print(f"⚠️ Erreur lors de la récupération du son {song['song']}: {e}")
+    return songs_of_week, songs_uris
+
 
 # ----- Créer playlist si nouvelles sorties -----
-if new_tracks_set:
+def create_playlist(sp, limiter, user_id, today, new_tracks, songs_uris):
+    """
+    Crée la playlist HEBDO de la semaine (ou complète celle d'un run précédent)
+    et retourne son URL publique.
+    """
     playlist_name = f"HEBDO - {today.strftime('%d/%m')}"
-    user_id = sp.me()['id']
-    playlist = sp.user_playlist_create(user=user_id, name=playlist_name, public=False)
-    
-    # Ajouter les nouvelles sorties
-    sp.playlist_add_items(playlist_id=playlist['id'], items=list(new_tracks_set))
-    
-    # Ajouter les 3 chansons du siècle
-    if songs_uris:
-        sp.playlist_add_items(playlist_id=playlist['id'], items=songs_uris)
-    
+    # Les nouvelles sorties puis les 3 chansons du siècle, par paquets de 100
+    writer = PlaylistWriter(sp, limiter, user_id)
+    playlist, added = writer.write(playlist_name, new_tracks + songs_uris)
+
     # Récupérer l'URL publique Spotify de la playlist pour l'inclure dans l'email
     if playlist.get('external_urls') and playlist['external_urls'].get('spotify'):
         playlist_url = playlist['external_urls']['spotify']
@@ -336,180 +603,486 @@ if new_tracks_set:
         # fallback vers l'URL construite depuis l'ID
         playlist_url = f"https://open.spotify.com/playlist/{playlist['id']}"
 
-    total_tracks = len(new_tracks_set) + len(songs_uris)
-    print(f"✅ Playlist '{playlist_name}' créée avec {total_tracks} titres ! ({playlist_url})")
-    print(f"   - Nouvelles sorties: {len(new_tracks_set)}")
+    total_tracks = len(new_tracks) + len(songs_uris)
+    print(f"✅ Playlist '{playlist_name}' prête avec {total_tracks} titres ! ({playlist_url})")
+    print(f"   - Nouvelles sorties: {len(new_tracks)}")
     print(f"   - Sons du siècle: {len(songs_uris)}")
-else:
-    print("ℹ️ Pas de nouvelles sorties cette semaine.")
-
-# ----- Fonction d'envoi d'email -----
-def send_email(subject, text_body, html_body=None):
-    msg = MIMEMultipart('alternative')
-    msg['From'] = EMAIL_USER
-    msg['To'] = EMAIL_TO
-    msg['Subject'] = subject
-
-    # Partie texte (fallback)
-    part1 = MIMEText(text_body, 'plain')
-    msg.attach(part1)
-
-    # Partie HTML (optionnelle)
-    if html_body:
-        part2 = MIMEText(html_body, 'html')
-        msg.attach(part2)
-
-    with smtplib.SMTP('smtp.gmail.com', 587) as server:
-        server.starttls()
-        server.login(EMAIL_USER, EMAIL_PASSWORD)
-        server.send_message(msg)
-    print("✅ Email envoyé !")
-
-# ----- Envoi du rapport -----
-# Dédupliquer les listes
-music_releases = list(dict.fromkeys(music_releases))
-podcast_releases = list(dict.fromkeys(podcast_releases))
-
-if SEND_EMAIL:
-    week_number = today.isocalendar()[1]
-
-    # Construire corps texte et HTML avec deux sections : Musique et Podcasts
-    text_body = "🎶 Voici les sorties Spotify de cette semaine :\n\n"
-    html_body = "<html><body><h3> 🍝 Au menu cette semaine</h3>"
-
-    # Section Musique
-    if music_releases:
-        text_body += "-- Musique --\n"
-        html_body += "<h4>🎶 Musique</h4><ul>"
-        for line in music_releases:
-            text_body += f"{line}\n"
-            safe_line = line.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
-            html_body += f"<li>{safe_line}</li>"
-        html_body += "</ul>"
-        
-        # Lien vers la playlist juste après les sorties musicales
-        if playlist_url:
-            text_body += f"\n🔗 Playlist de la semaine : {playlist_url}\n"
-            html_body += f"<p style=\"margin-top:15px; padding:12px; background-color:#1DB954; border-radius:8px; text-align:center;\"><a href=\"{playlist_url}\" target=\"_blank\" style=\"text-decoration:none; color:white; font-weight:bold; font-size:1em;\">🎧 Écouter la playlist de la semaine</a></p>"
-
-    # Section Podcasts
-    if podcast_releases:
-        text_body += "\n-- Podcasts --\n"
-        html_body += "<h4>🎧 Podcasts</h4><ul>"
-        for show_name, episode_name in podcast_releases:
-            text_body += f"{show_name} - {episode_name}\n"
-            safe_show = show_name.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
-            safe_episode = episode_name.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
-            html_body += f"<li><strong>{safe_show}</strong> - {safe_episode}</li>"
-        html_body += "</ul>"
-
-    # Section Découvertes (Recommandations)
-    if recommendations:
-        text_body += "\n-- Découvertes --\n"
-        html_body += "<h4>🔍 Découvertes</h4><p style=\"font-size:0.9em; color:#666;\">3 morceaux que tu pourrais aimer basés sur tes nouvelles sorties :</p><ul>"
-        for line in recommendations:
-            text_body += f"{line}\n"
-            safe_line = line.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
-            html_body += f"<li>{safe_line}</li>"
-        html_body += "</ul>"
-
-    # Section Classiques hip-hop de la semaine
-    if classics_of_week:
-        text_body += f"\n-- Les Classiques Hip-Hop de la semaine --\n"
-        text_body += "3 albums incontournables du classement Rolling Stone des 200 meilleurs albums hip-hop :\n\n"
-        
-        html_body += f"<h4>📀 Les Classiques Hip-Hop de la semaine</h4>"
-        html_body += "<p style=\"font-size:0.9em; color:#666;\">3 Classiques du Hip-Hop à (ré)écouter (Rolling Stone) :</p>"
-        
-        for classic in classics_of_week:
-            # Version texte
-            text_body += f"• {classic['artist']} - {classic['album']} ({classic['year']})\n"
-            text_body += f"  {classic['url']}\n"
-            
-            # Ajouter infos Genius si disponibles
-            if classic.get('genius_info'):
-                ginfo = classic['genius_info']
-                if ginfo.get('description'):
-                    text_body += f"  À propos : {ginfo['description'][:200]}...\n"
-                if ginfo.get('facts'):
-                    text_body += f"  💡 Le saviez-vous ? {ginfo['facts'][0][:200]}...\n"
-            text_body += "\n"
-            
-            # Version HTML enrichie
-            html_body += f"<div style=\"margin-bottom:20px; padding:15px; background-color:#f8f8f8; border-left:4px solid #1DB954;\">"
-            html_body += f"<strong style=\"font-size:1.1em;\">{classic['artist']}</strong> - <em>{classic['album']}</em> ({classic['year']})<br>"
-            html_body += f"<a href=\"{classic['url']}\" target=\"_blank\" style=\"text-decoration:none; color:#1DB954; font-size:0.9em;\">🎵 Spotify</a>"
-            
-            # Ajouter les infos Genius en HTML
-            if classic.get('genius_info'):
-                ginfo = classic['genius_info']
-                
-                if ginfo.get('description'):
-                    html_body += f"<p style=\"margin-top:10px; font-size:0.9em; color:#555;\"><strong>À propos de l'artiste :</strong><br>{ginfo['description'][:250]}...</p>"
-                
-                if ginfo.get('release_date'):
-                    html_body += f"<p style=\"margin-top:5px; font-size:0.85em; color:#777;\">📅 Sorti le : {ginfo['release_date']}</p>"
-                
-                if ginfo.get('facts') and len(ginfo['facts']) > 0:
-                    html_body += f"<p style=\"margin-top:10px; padding:10px; background-color:#fff; border-left:3px solid #FFD700; font-size:0.9em; color:#333;\">"
-                    html_body += f"<strong>💡 Le saviez-vous ?</strong><br>{ginfo['facts'][0][:300]}..."
-                    html_body += f"</p>"
-                
-                if ginfo.get('url'):
-                    html_body += f"<p style=\"margin-top:5px;\"><a href=\"{ginfo['url']}\" target=\"_blank\" style=\"text-decoration:none; color:#FFD700; font-weight:bold; font-size:0.85em;\">💡Genius</a></p>"
-            
-            html_body += f"</div>"
+    print(f"   - Ajoutés par ce run: {added}")
+    return playlist_url
+
+
+# ----- Envoi des mails -----
+def send_emails(outbox):
+    """
+    Envoie les mails du run sur une seule connexion SMTP. `outbox` : liste de
+    (nom du profil, message). Un échec n'empêche pas l'envoi des suivants.
+    Retourne, pour chaque message, le temps d'envoi, les tentatives et l'erreur éventuelle.
+    """
+    with Mailer(SMTP_HOST, SMTP_PORT, EMAIL_USER, EMAIL_PASSWORD, starttls=SMTP_STARTTLS) as mailer:
+        for name, msg in outbox:
+            try:
+                mailer.send(msg)
+                print("✅ Email envoyé !")
+            except Exception as e:
+                print(f"⚠️ Email non envoyé ({name}) : {e}")
+    if len(outbox) > 1:
+        print(f"📧 {len(outbox)} mail(s) sur {mailer.connections} connexion(s) SMTP")
+    return [dict(delivery, profile=name) for (name, _), delivery in zip(outbox, mailer.deliveries)]
+
+
+# ----- Construction du rapport -----
+def build_report(today, music_releases, podcast_releases, recommendations, classics_of_week,
+                 songs_of_week, errors_list, playlist_url=None, run_summary=None):
+    """
+    Construit le mail de la semaine. Retourne (sujet, corps texte, corps HTML).
+    `run_summary` : lignes optionnelles (temps du run) ajoutées après les erreurs.
+    """
+    return render_report(today, music_releases, podcast_releases, recommendations, classics_of_week,
+                         songs_of_week, errors_list, playlist_url, run_summary)
+
+
+def profile_clients(profile):
+    """Clients Spotify d'un profil : ceux du bot s'il a le même token, sinon les siens (sur le même pool HTTP)."""
+    if profile.clients is None:
+        if profile.refresh_token_env == clients.refresh_token_env:
+            profile.clients = clients
+        else:
+            profile.clients = Clients(refresh_token_env=profile.refresh_token_env,
+                                      cache_path=f".cache-spotify-{profile.name}", http=clients.http)
+    return profile.clients
+
+
+def discover_artists(sp, artists, since, limiter, batcher, state, today, checkpoint):
+    """
+    Étape des artistes, reprise là où un run interrompu s'est arrêté : en scan
+    artiste par artiste, les résultats sont ajoutés au point de reprise par
+    lots de ARTIST_BATCH artistes. Retourne (découvertes dans l'ordre de
+    `artists`, IDs des artistes scannés en entier).
+    """
+    scanned = checkpoint.scanned_artists()
+    if checkpoint.done('artistes'):
+        return [(artist, *scanned[artist['id']]) for artist in artists], checkpoint.get('artistes')
+
+    if RELEASE_FEED:
+        # Grosse liste d'artistes : un passage sur le flux des nouveautés (featurings
+        # compris), et des scans individuels seulement pour ce que le flux ne couvre pas
+        discoveries, checked = feed_discoveries(sp, artists, since, limiter, batcher, store=state,
+                                                market=SPOTIFY_MARKET, workers=SCAN_WORKERS, today=today)
+        checkpoint.add_artists(discoveries)
+        checked = [artist['id'] for artist in checked]
+    else:
+        remaining = [artist for artist in artists if artist['id'] not in scanned]
+        if scanned:
+            print(f"♻️ {len(scanned)} artiste(s) déjà scanné(s), {len(remaining)} restant(s)")
+        for start in range(0, len(remaining), ARTIST_BATCH):
+            batch = discover_releases(sp, remaining[start:start + ARTIST_BATCH], since,
+                                      workers=SCAN_WORKERS, limiter=limiter, store=state)
+            checkpoint.add_artists(batch)
+            scanned.update((artist['id'], (recent, error)) for artist, recent, error in batch)
+        discoveries = [(artist, *scanned[artist['id']]) for artist in artists]
+        checked = [artist['id'] for artist, _, error in discoveries if not error]
+    checkpoint.save('artistes', checked)
+    return discoveries, checked
+
+
+def run(today=None, dry_run=False, offline=False, profiles=None, resume=False, detections=None):
+    """
+    Exécute un run complet : scan, enrichissement, playlist, mail.
+    `dry_run` : rien n'est écrit (ni playlist, ni mail, ni store d'état), le
+    mail est enregistré dans preview.html. `offline` : comme dry_run, sans
+    aucun appel réseau (aperçu instantané du mail avec les classiques du catalogue).
+    `profiles` : mode multi-utilisateurs ; les artistes et podcasts communs ne sont
+    scannés qu'une fois, puis chaque profil reçoit sa playlist et son mail.
+    `resume` : reprend un run interrompu de la même semaine à son dernier point
+    de reprise (voir checkpoint.py), sans refaire les étapes terminées.
+    `detections` : sorties détectées au fil de la semaine par le mode service
+    (format de discover_releases), qui remplacent le scan des artistes.
+    """
+    clients.offline = offline
+    dry_run = dry_run or offline
+
+    multi = profiles is not None
+    if not multi:
+        profiles = [Profile('default', load_catalog("artists.json"), load_catalog("podcasts.json"), EMAIL_TO,
+                            clients=clients)]
+
+    # ----- Déterminer la semaine passée -----
+    # Une reprise garde la date du run d'origine (même semaine, même playlist HEBDO)
+    today = today or datetime.today()
+    checkpoint = Checkpoint(run_key(today, [profile.name for profile in profiles]), today,
+                            path=None if dry_run else CHECKPOINT_DIR, resume=resume)
+    if checkpoint.resumed:
+        print(f"♻️ Reprise du run du {checkpoint.today.strftime('%d/%m')}, "
+              f"étape(s) terminée(s) : {', '.join(checkpoint.stages) or 'aucune'}")
+    today = checkpoint.today
+    last_week = today - timedelta(days=7)
+
+    # Tirer les classiques et les sons du siècle dès le début, dans la rotation de
+    # chaque catalogue. Depuis le store précalculé, ils arrivent avec leur URL, URI
+    # et souvent leur Genius ; sinon leurs albums / pistes sont résolus dans les
+    # mêmes requêtes groupées que les nouvelles sorties. L'enrichissement manquant
+    # tourne en tâche de fond pendant tout le scan
+    catalog_store = CatalogStore.open_existing(CATALOG_STORE_PATH)
+    rotation = Rotation(STATE_PATH, persist=not dry_run)
+    selected_classics = select_entries(catalog_store, rotation, 'classics_hiphop')
+    selected_songs = select_entries(catalog_store, rotation, 'best_songs_21st_century')
+
+    report = RunReport()
+    report.extra['resumed'] = list(checkpoint.stages)
+    enrichment = EnrichmentStage()
+    if clients.genius and not checkpoint.done('enrichissement'):
+        for classic in selected_classics:
+            if classic.get('genius_info') is None:
+                enrichment.submit(('album', classic['id']), get_album_genius_info, classic['album'], classic['artist'])
+        for song in selected_songs:
+            if song.get('genius_info') is None:
+                enrichment.submit(('song', song['id']), get_song_genius_info, song['song'], song['artist'])
 
+    # Ce que reçoit chaque profil : sorties, podcasts, découvertes, erreurs et playlist
+    editions = {profile.name: {'new_tracks': [], 'music_releases': [], 'podcast_releases': [],
+                               'recommendations': [], 'errors_list': [], 'playlist_url': None}
+                for profile in profiles}
 
-    # Section Meilleurs sons du 21e siècle
-    if songs_of_week:
-        text_body += f"\n-- Les Sons du Siècle --\n"
-        text_body += "3 morceaux parmi les meilleurs du 21e siècle (Rolling Stone) :\n\n"
-        
-        html_body += f"<h4>🎵 Les Sons du Siècle</h4>"
-        html_body += "<p style=\"font-size:0.9em; color:#666;\">3 morceaux parmi les meilleurs du 21e siècle (Rolling Stone) :</p>"
-        
+    if offline:
+        print("🛰️ Mode hors-ligne : scan Spotify et Genius ignorés")
+        classics_of_week = build_classics(selected_classics)
+        songs_of_week, songs_uris = build_songs(selected_songs)
+    else:
+        report.http = clients.http
+        with report.stage('connexion'):
+            sp = clients.sp
+            # Vérifier la connexion
+            clients.me
+
+        # Store d'état : sorties déjà signalées lors des runs précédents
+        state = StateStore(STATE_PATH)
+        limiter = report.limiter = RateLimiter()
+        batcher = SpotifyBatcher(sp, limiter, workers=SCAN_WORKERS)
+
+        if checkpoint.done('scan'):
+            # Scan terminé par le run interrompu : ses résultats, et ses écritures d'état à commiter
+            scan = checkpoint.get('scan')
+            state.restore(scan['state'])
+            for name, edition in scan['editions'].items():
+                editions[name].update(edition, podcast_releases=[tuple(release) for release in edition['podcast_releases']])
+            classics_of_week, songs_of_week, songs_uris = scan['classics'], scan['songs'], scan['songs_uris']
+        else:
+            # Un artiste ou un podcast suivi par plusieurs profils n'est scanné qu'une fois
+            artists = unique_by_id(profile.artists for profile in profiles)
+            shows = unique_by_id(profile.podcasts for profile in profiles)
+            if multi:
+                print(f"👥 {len(profiles)} profil(s) : {len(artists)} artiste(s) et {len(shows)} podcast(s) à scanner "
+                      f"({sum(len(p.artists) for p in profiles)} et {sum(len(p.podcasts) for p in profiles)} suivis)")
+
+            # Scan parallèle des artistes (SCAN_WORKERS=1 pour revenir au scan séquentiel)
+            with report.stage('artistes'):
+                if detections is not None:
+                    discoveries, checked = detections, []
+                else:
+                    discoveries, checked = discover_artists(sp, artists, last_week, limiter, batcher, state, today,
+                                                            checkpoint)
+            state.mark_checked('artist', checked)
+
+            with report.stage('albums et pistes'):
+                queue_releases(discoveries, batcher)
+                batcher.queue_albums([classic['id'] for classic in selected_classics if not classic.get('url')])
+                batcher.queue_tracks([song['id'] for song in selected_songs if not song.get('uri')])
+                batcher.resolve()
+            record_releases(discoveries, state)
+            week_credits = collect_credits(discoveries, batcher)
+            state.record_credits(week_credits)
+
+            with report.stage('podcasts'):
+                show_results = scan_shows(sp, shows, last_week, limiter, state)
+
+            with report.stage('classiques et sons'):
+                classics_of_week = build_classics(selected_classics, batcher)
+                songs_of_week, songs_uris = build_songs(selected_songs, batcher)
+
+            # Graphe des co-crédits (historique du store + cette semaine) pour les découvertes
+            with report.stage('recommandeur'):
+                recommender = Recommender(state.credits() + week_credits, today)
+
+            for profile in profiles:
+                edition = editions[profile.name]
+                artist_ids = {artist['id'] for artist in profile.artists}
+                show_ids = {show.get('id') for show in profile.podcasts}
+                suffix = f" ({profile.name})" if multi else ""
+                with report.stage(f'sorties{suffix}'):
+                    profile_discoveries = [discovery for discovery in discoveries
+                                           if discovery[0]['id'] in artist_ids]
+                    new_tracks, edition['music_releases'], edition['errors_list'] = collect_releases(
+                        profile_discoveries, batcher)
+                    edition['new_tracks'] = new_tracks
+                    edition['podcast_releases'], podcast_errors = collect_podcasts(
+                        [result for result in show_results if result[0].get('id') in show_ids])
+                    edition['errors_list'] += podcast_errors
+
+                with report.stage(f'recommandations{suffix}'):
+                    edition['recommendations'] = get_recommendations(sp, new_tracks, limiter, recommender,
+                                                                     profile_discoveries, artist_ids, store=state)
+
+            checkpoint.save('scan', {
+                'editions': editions,
+                'classics': classics_of_week, 'songs': songs_of_week, 'songs_uris': songs_uris,
+                'state': state.pending(),
+            })
+
+        # Une playlist écrite avant l'interruption n'est pas réécrite
+        playlists = checkpoint.get('playlists', {})
+        for profile in profiles:
+            edition = editions[profile.name]
+            suffix = f" ({profile.name})" if multi else ""
+            if profile.name in playlists:
+                edition['playlist_url'] = playlists[profile.name]
+            elif not edition['new_tracks']:
+                print(f"ℹ️ Pas de nouvelles sorties cette semaine{suffix}.")
+            elif dry_run:
+                print(f"🧪 Dry-run : playlist non créée ({len(edition['new_tracks']) + len(songs_uris)} titres)"
+                      f"{suffix}")
+            else:
+                # La playlist est écrite avec le token du profil ; un token invalide
+                # n'empêche pas les autres profils de recevoir la leur
+                with report.stage(f'playlist{suffix}'):
+                    try:
+                        owner = profile_clients(profile)
+                        edition['playlist_url'] = create_playlist(owner.sp, limiter, owner.me['id'], today,
+                                                                  edition['new_tracks'], songs_uris)
+                        playlists[profile.name] = edition['playlist_url']
+                        checkpoint.save('playlists', playlists)
+                    except Exception as e:
+                        edition['errors_list'].append(f"Playlist : {e}")
+                        print(f"⚠️ Playlist non créée{suffix}: {e}")
+
+    # ----- Récupérer l'enrichissement Genius (ce qui n'a pas fini à temps reste à None) -----
+    genius_results = {}
+    if checkpoint.done('enrichissement'):
+        enriched = checkpoint.get('enrichissement')
+        classics_of_week, songs_of_week = enriched['classics'], enriched['songs']
+    else:
+        with report.stage('genius'):
+            genius_results = enrichment.collect()
+        for classic in classics_of_week:
+            classic['genius_info'] = genius_results.get(('album', classic['id']), classic['genius_info'])
         for song in songs_of_week:
-            text_body += f"• {song['artist']} - {song['song']} ({song['year']})\n"
-            text_body += f"  {song['url']}\n"
-            
-            # Ajouter infos Genius en texte
-            if song.get('genius_info'):
-                ginfo = song['genius_info']
-                if ginfo.get('facts'):
-                    text_body += f"  💡 {ginfo['facts'][0][:150]}...\n"
-                if ginfo.get('url'):
-                    text_body += f"  📖 Genius: {ginfo['url']}\n"
-            text_body += "\n"
-            
-            # Version HTML enrichie
-            html_body += f"<div style=\"margin-bottom:15px; padding:12px; background-color:#f8f8f8; border-left:4px solid #1DB954;\">"
-            html_body += f"<strong style=\"font-size:1.05em;\">{song['artist']}</strong> - <em>{song['song']}</em> ({song['year']})<br>"
-            html_body += f"<a href=\"{song['url']}\" target=\"_blank\" style=\"text-decoration:none; color:#1DB954; font-size:0.9em;\">🎵Spotify</a>"
-            
-            # Ajouter les infos Genius en HTML
-            if song.get('genius_info'):
-                ginfo = song['genius_info']
-                
-                if ginfo.get('facts') and len(ginfo['facts']) > 0:
-                    html_body += f"<p style=\"margin-top:10px; padding:8px; background-color:#fff; border-left:3px solid #FFD700; font-size:0.85em; color:#333;\">"
-                    html_body += f"<strong>💡 Le saviez-vous ?</strong><br>{ginfo['facts'][0][:200]}..."
-                    html_body += f"</p>"
-                
-                if ginfo.get('url'):
-                    html_body += f"<p style=\"margin-top:5px;\"><a href=\"{ginfo['url']}\" target=\"_blank\" style=\"text-decoration:none; color:#FFD700; font-weight:bold; font-size:0.85em;\">💡Genius</a></p>"
-            
-            html_body += f"</div>"
+            song['genius_info'] = genius_results.get(('song', song['id']), song['genius_info'])
+        checkpoint.save('enrichissement', {'classics': classics_of_week, 'songs': songs_of_week})
+    if catalog_store is not None:
+        # Garder l'enrichissement dans le store : ces entrées ne coûteront plus d'appel Genius
+        for kind, entries in (('album', selected_classics), ('song', selected_songs)):
+            for entry in entries:
+                info = genius_results.get((kind, entry['id']))
+                if info and 'position' in entry:
+                    catalog_store.set_genius(entry['catalog'], entry['position'], info)
+        catalog_store.close()
+
+    if not offline:
+        print_request_report(limiter, batcher)
+    if clients.genius:
+        print(f"🧠 Cache Genius : {clients.genius_cache.summary()}")
+        report.extra['genius_cache'] = {'hits': clients.genius_cache.hits, 'misses': clients.genius_cache.misses}
+        clients.close_genius_cache()
+    if clients._http:
+        clients.http.print_latency_report()
+
+    # ----- Envoi du rapport à chaque profil -----
+    report.extra.update(profiles=len(profiles), errors=sum(len(e['errors_list']) for e in editions.values()))
+    outbox, timings = [], []
+    delivered = checkpoint.get('mails', [])
+    for profile in profiles:
+        if profile.name in delivered:
+            print(f"♻️ Mail déjà envoyé avant l'interruption ({profile.name})")
+            continue
+        edition = editions[profile.name]
+        render_start = time.perf_counter()
+        # Les sorties sont déjà dédupliquées à l'ingestion (ReleaseDigest)
+        podcast_releases = list(dict.fromkeys(edition['podcast_releases']))
+
+        subject, text_body, html_body = build_report(
+            today, edition['music_releases'], podcast_releases, edition['recommendations'], classics_of_week, songs_of_week,
+            edition['errors_list'], edition['playlist_url'],
+            run_summary=report.summary_lines() if REPORT_IN_EMAIL else None)
+        timings.append({'profile': profile.name, 'render_ms': round((time.perf_counter() - render_start) * 1000, 2)})
+        if dry_run:
+            preview_path = PREVIEW_PATH if not multi else os.path.join(BASE_DIR, f"preview-{profile.name}.html")
+            with open(preview_path, "w") as f:
+                f.write(html_body)
+            print(text_body)
+            print(f"🧪 Aperçu du mail enregistré dans {preview_path}")
+        elif SEND_EMAIL:
+            outbox.append((profile.name, build_message(EMAIL_USER, profile.email_to, subject, text_body, html_body)))
+
+    failed = []
+    if outbox:
+        with report.stage('email'):
+            deliveries = send_emails(outbox)
+        for timing, delivery in zip(timings, deliveries):
+            timing.update(send_ms=round(delivery['seconds'] * 1000, 2), attempts=delivery['attempts'],
+                          error=delivery['error'])
+        failed = [delivery['profile'] for delivery in deliveries if delivery['error']]
+        checkpoint.save('mails', delivered + [delivery['profile'] for delivery in deliveries
+                                              if not delivery['error']])
+    report.extra['emails'] = timings
+
+    # ----- Mémoriser les sorties signalées (seulement une fois le run terminé) -----
+    # Si un mail n'est pas parti, rien n'est mémorisé : le prochain run renverra ces sorties
+    # (et les mêmes classiques et sons, la rotation n'avançant pas non plus) ; avec --resume,
+    # seuls les mails manquants partent, puis l'état est mémorisé
+    if not offline:
+        if not dry_run and not failed:
+            state.commit()
+        state.close()
+    if not dry_run and not failed:
+        rotation.commit()
+        checkpoint.clear()
+    rotation.close()
+
+    report.write(REPORT_PATH)
+    if failed:
+        raise RuntimeError(f"mail non envoyé pour : {', '.join(failed)}")
+
+
+# ----- Mode service -----
+def alert_line(artist, release):
+    """Ligne d'une alerte : comme dans le mail de la semaine, avec le lien de la sortie."""
+    url = f"https://open.spotify.com/album/{release.id}"
+    if release.album_group == 'appears_on':
+        main_artists = ', '.join(name for _, name in release.artists)
+        return f"{main_artists} ft. {artist['artist']} - {release.name} ({url})"
+    return f"{artist['artist']} - {release.name} ({url})"
+
+
+def send_alerts(profiles, buffer):
+    """
+    Alertes immédiates : un mail court par profil pour les sorties détectées et
+    pas encore signalées. Elles restent aussi dans la playlist et le mail de la
+    semaine ; une alerte qui n'est pas partie est retentée à la détection suivante.
+    """
+    pending = buffer.unalerted()
+    outbox, keys = [], {}
+    for profile in profiles:
+        followed = {artist['id']: artist for artist in profile.artists}
+        matches = [(followed[artist_id], release) for artist_id, release in pending if artist_id in followed]
+        if matches:
+            body = "\n".join(alert_line(artist, release) for artist, release in matches)
+            subject = f"🔔 {len(matches)} nouvelle(s) sortie(s)"
+            outbox.append((profile.name, build_message(EMAIL_USER, profile.email_to, subject, body)))
+            keys[profile.name] = {(artist['id'], release.id) for artist, release in matches}
+    if not outbox:
+        return
+    deliveries = send_emails(outbox)
+    failed = {key for delivery in deliveries if delivery['error'] for key in keys[delivery['profile']]}
+    buffer.mark_alerted(set().union(*keys.values()) - failed)
+
+
+def serve(profiles=None, alerts=DAEMON_ALERTS, tick=DAEMON_TICK):
+    """
+    Mode service : chaque artiste est interrogé à son rythme tout au long de
+    la semaine (voir scheduler.py) et ses nouvelles sorties sont mises en
+    attente. À l'échéance DAEMON_DIGEST_AT, un run normal envoie la playlist et
+    le mail de la semaine, le scan des artistes remplacé par ces détections.
+    `alerts` : un mail court dès qu'une sortie est détectée. Avec RELEASE_FEED,
+    le flux des nouveautés est aussi relu toutes les DAEMON_FEED_EVERY secondes :
+    la sortie d'un artiste suivi y est vue en quelques minutes.
+    """
+    watchers = profiles or [Profile('default', load_catalog("artists.json"), load_catalog("podcasts.json"), EMAIL_TO,
+                                    clients=clients)]
+    artists = unique_by_id(profile.artists for profile in watchers)
+    sp = clients.sp
+    clients.me
+
+    state = StateStore(STATE_PATH)
+    scheduler = PollScheduler(artists, STATE_PATH)
+    buffer = DetectionBuffer(STATE_PATH)
+    limiter = RateLimiter()
+    # Premier démarrage : le prochain mail est celui de la prochaine échéance
+    last_digest = buffer.last_digest() or last_digest_time(datetime.now(), DAEMON_DIGEST_AT).timestamp()
+    retry_at = feed_at = 0
+    print(f"🛰️ Mode service : {len(artists)} artiste(s), {scheduler.weekly_polls:.0f} passage(s) par semaine "
+          f"(≈{scheduler.weekly_polls / 168:.0f} par heure), mail de la semaine {DAEMON_DIGEST_AT}"
+          f"{', flux des nouveautés' if RELEASE_FEED else ''}{', alertes immédiates' if alerts else ''}")
+    try:
+        while True:
+            now = time.time()
+            due = scheduler.due(now, tick)
+            since = datetime.fromtimestamp(now) - timedelta(days=7)
+            results = []
+            if due:
+                results = discover_releases(sp, due, since, workers=SCAN_WORKERS, limiter=limiter, store=state)
+                scheduler.polled([artist['id'] for artist in due], now)
+            if RELEASE_FEED and now >= feed_at:
+                feed_at = now + DAEMON_FEED_EVERY
+                try:
+                    results += feed_matches(sp, artists, since, limiter, store=state, market=SPOTIFY_MARKET)
+                except Exception as e:
+                    print(f"⚠️ Flux des nouveautés indisponible : {e}")
+            if results:
+                new = buffer.add(results, now)
+                for artist, release in new:
+                    print(f"🆕 {alert_line(artist, release)}")
+                if alerts and new:
+                    send_alerts(watchers, buffer)
+
+            digest_at = last_digest_time(datetime.fromtimestamp(now), DAEMON_DIGEST_AT)
+            if digest_at.timestamp() > last_digest and now >= retry_at:
+                until = digest_at.timestamp()
+                try:
+                    # Reprise automatique : un mail raté n'est retenté que pour ce qui manque
+                    run(today=digest_at, profiles=profiles, resume=True,
+                        detections=buffer.discoveries(artists, until))
+                except Exception as e:
+                    retry_at = now + DAEMON_RETRY
+                    print(f"⚠️ Mail de la semaine non envoyé, nouvel essai dans {DAEMON_RETRY // 60} min : {e}")
+                else:
+                    buffer.digest_sent(until)
+                    last_digest = until
+                    # Relire les sorties mémorisées par le run et ajuster le rythme des artistes
+                    state.close()
+                    state = StateStore(STATE_PATH)
+                    scheduler.refresh()
+            time.sleep(max(0.0, now + tick - time.time()))
+    except KeyboardInterrupt:
+        print("🛑 Mode service arrêté")
+    finally:
+        state.close()
+        scheduler.close()
+        buffer.close()
+
 
-    if errors_list:
-        text_body += "\nErreurs rencontrées :\n"
-        html_body += "<h3>Erreurs rencontrées :</h3><ul>"
-        for e in errors_list:
-            text_body += f"{e}\n"
-            safe_e = e.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
-            html_body += f"<li>{safe_e}</li>"
-        html_body += "</ul>"
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Spotify Weekly Release Bot")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="ne crée pas la playlist et n'envoie pas le mail (aperçu dans preview.html)")
+    parser.add_argument('--offline', action='store_true',
+                        help="aucun appel réseau : aperçu instantané du mail (implique --dry-run)")
+    parser.add_argument('--profiles', metavar='FICHIER',
+                        help="mode multi-utilisateurs : fichier JSON des profils (voir profiles.py)")
+    parser.add_argument('--build-catalogs', action='store_true',
+                        help="précalcule le store des catalogues (URL et URI Spotify) puis s'arrête")
+    parser.add_argument('--with-genius', action='store_true',
+                        help="avec --build-catalogs : enrichit aussi toutes les entrées via Genius")
+    parser.add_argument('--warm', action='store_true',
+                        help="prépare les données Genius des prochains tirages (la veille du run) puis s'arrête")
+    parser.add_argument('--weeks', type=int, default=1, help="avec --warm : nombre de tirages à préparer")
+    parser.add_argument('--resume', action='store_true',
+                        help="reprend le run interrompu de la semaine à son dernier point de reprise")
+    parser.add_argument('--daemon', action='store_true',
+                        help="mode service : scan étalé sur la semaine, mail de la semaine à DAEMON_DIGEST_AT")
+    parser.add_argument('--alerts', action='store_true',
+                        help="avec --daemon : un mail dès qu'une sortie est détectée (ou DAEMON_ALERTS=true)")
+    args = parser.parse_args(argv)
+    if args.build_catalogs:
+        build_catalogs(with_genius=args.with_genius)
+        return
+    if args.warm:
+        warm(weeks=args.weeks)
+        return
+    if args.daemon:
+        serve(profiles=load_profiles(args.profiles) if args.profiles else None, alerts=args.alerts or DAEMON_ALERTS)
+        return
+    run(dry_run=args.dry_run, offline=args.offline, resume=args.resume,
+        profiles=load_profiles(args.profiles) if args.profiles else None)
 
-    html_body += "</body></html>"
 
-    send_email(f" 🎶 Sorties de la Semaine - WK{week_number}", text_body, html_body)
+if __name__ == '__main__':
+    main()
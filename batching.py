@@ -0,0 +1,128 @@
+"""
+Hydratation groupée des albums et des pistes via les endpoints multi-ID de
+Spotify (`albums` : 20 IDs par appel, `tracks` : 50 IDs par appel).
+
+Les IDs sont d'abord mis en file depuis toutes les étapes du run (sorties des
+artistes, classiques, sons du siècle), puis résolus en une seule passe. Chaque
+réponse est convertie aussitôt en enregistrements compacts (releases.py) :
+le JSON brut n'est pas gardé.
+"""
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from releases import Album, Track
+
+ALBUMS_PER_CALL = 20
+TRACKS_PER_CALL = 50
+
+
+def chunks(items, size):
+    """Découpe une liste en morceaux de `size` éléments."""
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+class SpotifyBatcher:
+    """
+    Collecte des IDs d'albums et de pistes puis les résout par paquets.
+    Tous les appels passent par le RateLimiter du scan (backoff 429 partagé
+    et comptage des requêtes).
+    """
+
+    def __init__(self, sp, limiter, workers=1):
+        self.sp = sp
+        self.limiter = limiter
+        self.workers = workers
+        self.resolved = Counter()   # nombre d'objets résolus par type ('albums', 'tracks')
+        self._pending_albums = {}   # album_id -> besoin de toutes les pistes ?
+        self._pending_tracks = []
+        self._albums = {}
+        self._tracks = {}
+        self._errors = {}           # id -> message d'erreur
+
+    # ----- Mise en file -----
+    def queue_albums(self, album_ids, full_tracks=False):
+        """Ajoute des albums à résoudre. `full_tracks` : suivre la pagination des pistes."""
+        for album_id in album_ids:
+            if album_id not in self._albums:
+                self._pending_albums[album_id] = self._pending_albums.get(album_id, False) or full_tracks
+
+    def queue_tracks(self, track_ids):
+        for track_id in track_ids:
+            if track_id not in self._tracks and track_id not in self._pending_tracks:
+                self._pending_tracks.append(track_id)
+
+    # ----- Résolution -----
+    def resolve(self):
+        """Résout tous les IDs en attente avec le minimum de requêtes."""
+        pending_albums, self._pending_albums = self._pending_albums, {}
+        pending_tracks, self._pending_tracks = self._pending_tracks, []
+        jobs = [(self._fetch_albums, batch, pending_albums)
+                for batch in chunks(list(pending_albums), ALBUMS_PER_CALL)]
+        jobs += [(self._fetch_tracks, batch, None) for batch in chunks(pending_tracks, TRACKS_PER_CALL)]
+
+        def run(job):
+            fetch, batch, options = job
+            try:
+                fetch(batch, options)
+            except Exception as e:
+                for item_id in batch:
+                    self._errors[item_id] = str(e)
+
+        if self.workers > 1 and len(jobs) > 1:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                list(pool.map(run, jobs))
+        else:
+            for job in jobs:
+                run(job)
+
+    def _fetch_albums(self, batch, full_tracks):
+        response = self.limiter.call(self.sp.albums, batch)
+        for album_id, album in zip(batch, response['albums']):
+            if album is None:
+                self._errors[album_id] = f"album {album_id} introuvable"
+                continue
+            page = album['tracks']
+            tracks = [Track.from_json(track) for track in page['items']]
+            if full_tracks[album_id]:
+                # Les albums de plus de 50 pistes sont paginés : suivre les liens `next`
+                while page.get('next'):
+                    page = self.limiter.call(self.sp.next, page)
+                    tracks.extend(Track.from_json(track) for track in page['items'])
+            self._albums[album_id] = Album.from_json(album, tracks)
+            self.resolved['albums'] += 1
+
+    def _fetch_tracks(self, batch, _options):
+        response = self.limiter.call(self.sp.tracks, batch)
+        for track_id, track in zip(batch, response['tracks']):
+            if track is None:
+                self._errors[track_id] = f"piste {track_id} introuvable"
+                continue
+            self._tracks[track_id] = Track.from_json(track)
+            self.resolved['tracks'] += 1
+
+    # ----- Accès aux résultats -----
+    def album(self, album_id):
+        """Retourne l'album (Album, avec ses pistes), ou lève une erreur si sa résolution a échoué."""
+        if album_id not in self._albums:
+            raise LookupError(self._errors.get(album_id, f"album {album_id} non résolu"))
+        return self._albums[album_id]
+
+    def track(self, track_id):
+        """Retourne la piste (Track), ou lève une erreur si sa résolution a échoué."""
+        if track_id not in self._tracks:
+            raise LookupError(self._errors.get(track_id, f"piste {track_id} non résolue"))
+        return self._tracks[track_id]
+
+
+def print_request_report(limiter, batcher):
+    """
+    Affiche le nombre de requêtes Spotify du run par endpoint, et le nombre
+    qu'il aurait fallu sans batching (un appel par album / piste).
+    """
+    total = sum(limiter.calls.values())
+    batched = limiter.calls['albums'] + limiter.calls['tracks'] + limiter.calls['next']
+    unbatched = total - batched + batcher.resolved['albums'] + batcher.resolved['tracks']
+    details = ', '.join(f"{name} {count}" for name, count in sorted(limiter.calls.items()))
+    print(f"📊 Requêtes Spotify : {total} ({details})")
+    if unbatched > total:
+        print(f"   - Sans batching : {unbatched} (≈{unbatched - total} requêtes économisées)")
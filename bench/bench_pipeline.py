@@ -0,0 +1,239 @@
+"""
+Benchmark du pipeline complet (scan des artistes et des podcasts, recommandations,
+classiques et sons du siècle, Genius, playlist, mail) contre des faux serveurs
+Spotify, Genius et SMTP locaux.
+
+Les faux serveurs tournent dans un process séparé : le temps et la mémoire
+mesurés sont ceux du bot seul. Le premier run part d'un état vide, les suivants
+réutilisent le store d'état et le cache Genius (comme les runs hebdomadaires).
+Avec `--catalog-store`, le store des catalogues est construit avant les runs
+(comme `python app.py --build-catalogs --with-genius`). Avec `--warm`, les données
+Genius des classiques et sons de chaque run sont préparées juste avant lui
+(comme `python app.py --warm` la veille) : le run lui-même n'appelle plus Genius.
+
+Usage (depuis la racine du repo) :
+    python -m bench.bench_pipeline --artists 10000 --latency 0.02 --throttle-every 500 --runs 2
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import random
+import resource
+import tempfile
+import time
+import tracemalloc
+
+
+def serve_stand_ins(args, conn):
+    """Process des faux serveurs : envoie leurs adresses, puis leurs compteurs à chaque demande."""
+    from bench.fake_genius import FakeGenius
+    from bench.fake_smtp import FakeSMTP
+    from bench.fake_spotify import FakeCatalog, FakeSpotify
+
+    catalog = FakeCatalog(args.artists, n_shows=args.shows)
+    spotify = FakeSpotify(catalog, latency=args.latency, throttle_every=args.throttle_every)
+    genius = FakeGenius(latency=args.genius_latency, throttle_every=args.genius_throttle_every)
+    smtp = FakeSMTP(latency=args.smtp_latency, fail_every=args.smtp_fail_every)
+    conn.send({'spotify': spotify.start(), 'genius': genius.start(), 'smtp': smtp.start()})
+    while conn.recv() == 'stats':
+        conn.send({'spotify': dict(spotify.requests), 'spotify_429': spotify.throttled,
+                   'genius': dict(genius.requests), 'genius_429': genius.throttled, 'smtp': dict(smtp.stats)})
+    for server in (spotify, genius, smtp):
+        server.stop()
+
+
+def write_catalogs(directory, args):
+    """
+    Écrit artists.json, podcasts.json et les deux catalogues Rolling Stone synthétiques,
+    plus profiles.json avec `--profiles` : chaque profil suit une fraction `--follow`
+    des artistes et des podcasts, tirée au hasard (les profils se recoupent).
+    """
+    from bench.fake_spotify import FakeCatalog
+
+    catalog = FakeCatalog(args.artists, n_shows=args.shows)
+    files = {
+        'artists.json': catalog.artists,
+        'podcasts.json': catalog.shows,
+        'classics_hiphop.json': catalog.classics(200),
+        'best_songs_21st_century.json': catalog.best_songs(250),
+    }
+    profiles = []
+    for k in range(args.profiles):
+        rng = random.Random(k)
+        name = f"p{k}"
+        files[f"{name}-artists.json"] = rng.sample(catalog.artists, int(len(catalog.artists) * args.follow))
+        files[f"{name}-podcasts.json"] = rng.sample(catalog.shows, int(len(catalog.shows) * args.follow))
+        profiles.append({'name': name, 'artists': f"{name}-artists.json", 'podcasts': f"{name}-podcasts.json",
+                         'email_to': f"{name}@example.com", 'refresh_token_env': f"SPOTIPY_REFRESH_TOKEN_{name.upper()}"})
+    files['profiles.json'] = profiles
+    for filename, items in files.items():
+        with open(os.path.join(directory, filename), "w") as f:
+            json.dump(items, f)
+
+
+def connect(app, addresses):
+    """Branche les clients du bot sur les faux serveurs (à la place de l'OAuth et du token Genius)."""
+    from lyricsgenius import Genius
+    from spotipy import Spotify
+    from bench.fake_genius import FakeGenius
+    from http_pool import HttpPool
+
+    clients = app.clients
+    clients._http = HttpPool()
+    clients._sp = Spotify(auth="fake-token", requests_session=clients._http.session())
+    clients._sp.prefix = addresses['spotify']
+    clients._me = None
+
+    genius = Genius("fake-token", remove_section_headers=True, timeout=15)
+    fake_genius = FakeGenius()
+    fake_genius.base_url = addresses['genius']
+    fake_genius.configure(genius)
+    clients.http.mount(genius._session)
+    clients._genius, clients._genius_ready = genius, True
+    clients._genius_cache = None
+
+
+def connect_profiles(app, addresses, path):
+    """Profils du bench, chacun avec son propre client Spotify (un token, donc un utilisateur, par profil)."""
+    from spotipy import Spotify
+    from profiles import load_profiles
+
+    profiles = load_profiles(path)
+    for profile in profiles:
+        profile.clients = app.Clients(refresh_token_env=profile.refresh_token_env, http=app.clients.http)
+        profile.clients._sp = Spotify(auth=f"fake-token-{profile.name}", requests_session=app.clients.http.session())
+        profile.clients._sp.prefix = addresses['spotify']
+    return profiles
+
+
+def delta(after, before):
+    return {key: value - before.get(key, 0) for key, value in after.items() if value != before.get(key, 0)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du pipeline complet (hors-ligne)")
+    parser.add_argument('--artists', type=int, default=10000, help="nombre d'artistes synthétiques (10 à 50 000)")
+    parser.add_argument('--shows', type=int, default=20, help="nombre de podcasts synthétiques")
+    parser.add_argument('--latency', type=float, default=0.02, help="latence (s) par requête Spotify")
+    parser.add_argument('--throttle-every', type=int, default=0, help="un 429 Spotify toutes les N requêtes")
+    parser.add_argument('--genius-latency', type=float, default=0.05, help="latence (s) par requête Genius")
+    parser.add_argument('--genius-throttle-every', type=int, default=0, help="un 429 Genius toutes les N requêtes")
+    parser.add_argument('--smtp-latency', type=float, default=0.01, help="latence (s) par réponse SMTP")
+    parser.add_argument('--smtp-fail-every', type=int, default=0, help="un refus SMTP temporaire tous les N mails")
+    parser.add_argument('--workers', type=int, default=8, help="SCAN_WORKERS du bot")
+    parser.add_argument('--feed', action='store_true',
+                        help="détection par le flux des nouveautés (RELEASE_FEED=true) au lieu du scan par artiste")
+    parser.add_argument('--profiles', type=int, default=0, help="mode multi-utilisateurs avec N profils")
+    parser.add_argument('--follow', type=float, default=0.5, help="fraction des artistes suivie par chaque profil")
+    parser.add_argument('--catalog-store', action='store_true',
+                        help="précalculer le store des catalogues avant les runs (tirage sans appel réseau)")
+    parser.add_argument('--warm', action='store_true',
+                        help="préparer les données Genius des tirages avant chaque run (hors mesure)")
+    parser.add_argument('--runs', type=int, default=2, help="runs successifs (le premier part d'un état vide)")
+    parser.add_argument('--tracemalloc', action='store_true',
+                        help="mesurer aussi le pic de mémoire Python par run et par étape (ralentit le run)")
+    parser.add_argument('--json', help="écrire les résultats dans ce fichier JSON")
+    args = parser.parse_args()
+    logging.getLogger('spotipy').setLevel(logging.CRITICAL)       # les 429 injectés sont attendus
+    logging.getLogger('lyricsgenius').setLevel(logging.CRITICAL)
+
+    workdir = tempfile.mkdtemp(prefix="bench-pipeline-")
+    write_catalogs(workdir, args)
+
+    parent_conn, child_conn = multiprocessing.Pipe()
+    stand_ins = multiprocessing.Process(target=serve_stand_ins, args=(args, child_conn), daemon=True)
+    stand_ins.start()
+    addresses = parent_conn.recv()
+
+    # Configuration lue par les modules du bot à l'import
+    os.environ.update({
+        'CATALOG_DIR': workdir,
+        'STATE_PATH': os.path.join(workdir, "state.db"),
+        'GENIUS_CACHE_PATH': os.path.join(workdir, "genius.db"),
+        'CATALOG_STORE_PATH': os.path.join(workdir, "catalog.db"),
+        'CHECKPOINT_DIR': os.path.join(workdir, "checkpoint"),
+        'RUN_REPORT_PATH': os.path.join(workdir, "run-report.json"),
+        'SCAN_WORKERS': str(args.workers),
+        'RELEASE_FEED': 'true' if args.feed else 'false',
+        'SMTP_HOST': addresses['smtp'][0],
+        'SMTP_PORT': str(addresses['smtp'][1]),
+        'SMTP_STARTTLS': 'false',
+        'EMAIL_USER': 'bot@example.com',
+        'EMAIL_PASSWORD': 'fake',
+        'EMAIL_TO': 'moi@example.com',
+    })
+    import app
+
+    print(f"{args.artists} artistes, {args.shows} podcasts, latence Spotify {args.latency * 1000:.0f} ms, "
+          f"Genius {args.genius_latency * 1000:.0f} ms, SMTP {args.smtp_latency * 1000:.0f} ms, "
+          f"429 toutes les {args.throttle_every or '∞'} requêtes, {args.workers} workers")
+    if args.profiles:
+        print(f"{args.profiles} profils suivant chacun {args.follow:.0%} des artistes "
+              f"({int(args.artists * args.follow) * args.profiles} suivis au total)")
+    results = []
+    try:
+        if args.catalog_store:
+            connect(app, addresses)
+            start = time.perf_counter()
+            app.build_catalogs(with_genius=True)
+            print(f"📚 Store des catalogues construit en {time.perf_counter() - start:.2f}s")
+        for run_index in range(args.runs):
+            connect(app, addresses)
+            if args.warm:
+                app.warm()
+            profiles = connect_profiles(app, addresses, os.path.join(workdir, "profiles.json")) if args.profiles else None
+            parent_conn.send('stats')
+            before = parent_conn.recv()
+            if args.tracemalloc:
+                tracemalloc.start()
+            start = time.perf_counter()
+            app.run(profiles=profiles)
+            elapsed = time.perf_counter() - start
+            tracemalloc.stop()
+            parent_conn.send('stats')
+            after = parent_conn.recv()
+            with open(os.environ['RUN_REPORT_PATH']) as f:
+                report = json.load(f)
+            results.append({
+                'run': run_index + 1,
+                'seconds': round(elapsed, 3),
+                'spotify': delta(after['spotify'], before['spotify']),
+                'spotify_429': after['spotify_429'] - before['spotify_429'],
+                'genius_429': after['genius_429'] - before['genius_429'],
+                'genius': delta(after['genius'], before['genius']),
+                'smtp': delta(after['smtp'], before['smtp']),
+                'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+                'python_peak_mb': report.get('python_peak_mb'),
+                'stages': report['stages'],
+            })
+    finally:
+        parent_conn.send('stop')
+        stand_ins.join(timeout=5)
+
+    print()
+    print(f"{'run':>4} {'temps (s)':>10} {'Spotify':>8} {'429':>5} {'Genius':>7} {'mails':>6} "
+          f"{'RSS max (Mo)':>13} {'pic Python (Mo)':>16}")
+    for result in results:
+        python_peak = f"{result['python_peak_mb']:.1f}" if result['python_peak_mb'] is not None else "-"
+        print(f"{result['run']:>4} {result['seconds']:>10.2f} {sum(result['spotify'].values()):>8} "
+              f"{result['spotify_429']:>5} {sum(result['genius'].values()):>7} "
+              f"{result['smtp'].get('messages', 0):>6} {result['max_rss_mb']:>13.1f} {python_peak:>16}")
+    for result in results:
+        stages = ', '.join(f"{stage['stage']} {stage['seconds']:.2f}s"
+                           + (f" {stage['python_peak_mb']:.1f} Mo" if 'python_peak_mb' in stage else "")
+                           for stage in result['stages'])
+        print(f"  run {result['run']} : {stages}")
+        routes = ', '.join(f"{route} {count}" for route, count in
+                           sorted(result['spotify'].items(), key=lambda item: -item[1]))
+        print(f"         Spotify : {routes}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({'config': vars(args), 'runs': results}, f, indent=2, ensure_ascii=False)
+        print(f"📝 Résultats écrits dans {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Benchmark du scan des artistes contre le faux serveur Spotify local.
+
+Usage (depuis la racine du repo) :
+    python -m bench.bench_scan --artists 500 --latency 0.05 --workers 1 8 16
+"""
+import argparse
+import logging
+import time
+from datetime import datetime, timedelta
+
+from bench.fake_spotify import FakeCatalog, FakeSpotify
+from batching import SpotifyBatcher, print_request_report
+from http_pool import HttpPool
+from scanner import RateLimiter, scan_artists
+
+
+def run(fake, prefix, artists, workers):
+    http = HttpPool()
+    sp = fake.client(prefix, http)
+    limiter = RateLimiter()
+    batcher = SpotifyBatcher(sp, limiter, workers=workers)
+    fake.requests.clear()
+    start = time.perf_counter()
+    tracks, releases, errors = scan_artists(sp, artists, datetime.today() - timedelta(days=7),
+                                            workers=workers, limiter=limiter, batcher=batcher)
+    elapsed = time.perf_counter() - start
+    print_request_report(limiter, batcher)
+    http.print_latency_report(top=3)
+    return elapsed, fake.total_requests, limiter.throttled, len(tracks), len(releases), len(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du scan des artistes (hors-ligne)")
+    parser.add_argument('--artists', type=int, default=200, help="nombre d'artistes synthétiques")
+    parser.add_argument('--latency', type=float, default=0.05, help="latence (s) par requête")
+    parser.add_argument('--throttle-every', type=int, default=0, help="un 429 toutes les N requêtes")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 8, 16])
+    args = parser.parse_args()
+    logging.getLogger('spotipy').setLevel(logging.CRITICAL)  # les 429 injectés sont attendus
+
+    catalog = FakeCatalog(args.artists)
+    fake = FakeSpotify(catalog, latency=args.latency, throttle_every=args.throttle_every)
+    prefix = fake.start()
+    try:
+        print(f"{args.artists} artistes, latence {args.latency * 1000:.0f} ms, 429 toutes les "
+              f"{args.throttle_every or '∞'} requêtes")
+        print(f"{'workers':>8} {'temps (s)':>10} {'requêtes':>9} {'429':>5} {'pistes':>7} {'lignes':>7} {'erreurs':>8} {'speedup':>8}")
+        baseline = None
+        for workers in args.workers:
+            elapsed, n_requests, throttled, n_tracks, n_lines, n_errors = run(fake, prefix, catalog.artists, workers)
+            baseline = baseline or elapsed
+            print(f"{workers:>8} {elapsed:>10.2f} {n_requests:>9} {throttled:>5} {n_tracks:>7} {n_lines:>7} "
+                  f"{n_errors:>8} {baseline / elapsed:>7.1f}x")
+    finally:
+        fake.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""
+Benchmark du mode service (scheduler.py), sans réseau : simulation de
+plusieurs semaines de passages sur des artistes synthétiques, comparée au
+scan hebdomadaire du vendredi.
+
+Une fraction `--frequent` des artistes sort un titre par semaine en moyenne,
+les autres un toutes les 8 semaines ; l'historique des 30 derniers jours est
+écrit dans un store d'état temporaire, comme après quelques semaines de runs.
+Pour chaque mode : requêtes `artist_albums` par heure (moyenne et pic) et
+délai entre une sortie et sa détection.
+
+Usage (depuis la racine du repo) :
+    python -m bench.bench_schedule --artists 10000 --weeks 4
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+from collections import Counter
+from datetime import datetime, timedelta
+
+from scheduler import WEEK, PollScheduler, last_digest_time
+from state_store import StateStore
+
+HOUR = 3600
+
+
+def releases_per_week(index, args):
+    return 1.0 if index < args.artists * args.frequent else 1 / 8
+
+
+def write_history(path, artists, args, start):
+    """Sorties des 30 derniers jours, tirées au même rythme que la simulation."""
+    store = StateStore(path)
+    rng = random.Random(1)
+    for index, artist in enumerate(artists):
+        n = sum(rng.random() < releases_per_week(index, args) / 7 for _ in range(30))
+        dates = [(start - timedelta(days=rng.randrange(30))).strftime("%Y-%m-%d") for _ in range(n)]
+        store.record('artist', artist['id'], [(f"old{artist['id']}-{k}", date) for k, date in enumerate(dates)])
+    store.commit()
+    store.close()
+
+
+def simulate_releases(artists, args, start):
+    """Instants de sortie (timestamps) par artiste sur la période simulée."""
+    rng = random.Random(2)
+    horizon = args.weeks * WEEK
+    releases = {}
+    for index, artist in enumerate(artists):
+        rate = releases_per_week(index, args) / WEEK
+        t = start + rng.expovariate(rate)
+        while t < start + horizon:
+            releases.setdefault(artist['id'], []).append(t)
+            t += rng.expovariate(rate)
+    return releases
+
+
+def delays(releases, polls):
+    """Délai (heures) entre chaque sortie et le premier passage qui suit."""
+    result = []
+    for artist_id, times in releases.items():
+        artist_polls = polls.get(artist_id, [])
+        for t in times:
+            index = next((i for i, poll in enumerate(artist_polls) if poll >= t), None)
+            if index is not None:
+                result.append((artist_polls[index] - t) / HOUR)
+    return result
+
+
+def summary(name, found, hourly=None, hours=0):
+    """Une ligne du tableau ; sans `hourly`, seulement les délais."""
+    load = "-", "-"
+    if hourly is not None:
+        per_hour = [hourly.get(h, 0) for h in range(hours)]
+        load = f"{statistics.mean(per_hour):.1f}", max(per_hour)
+    found = sorted(found)
+    p95 = found[int(len(found) * 0.95)] if found else 0
+    median = statistics.median(found) if found else 0
+    print(f"{name:>20} {load[0]:>10} {load[1]:>8} {median:>13.1f} {p95:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du mode service (simulation, sans réseau)")
+    parser.add_argument('--artists', type=int, default=10000, help="nombre d'artistes synthétiques")
+    parser.add_argument('--frequent', type=float, default=0.1, help="fraction d'artistes qui sortent chaque semaine")
+    parser.add_argument('--weeks', type=int, default=4, help="semaines simulées")
+    parser.add_argument('--tick', type=int, default=60, help="secondes entre deux ticks du mode service")
+    args = parser.parse_args()
+
+    artists = [{'artist': f"Artiste {i}", 'id': f"ar{i:05d}"} for i in range(args.artists)]
+    start_dt = last_digest_time(datetime.now(), "FRI 07:00")
+    start = start_dt.timestamp()
+    hours = args.weeks * 7 * 24
+    releases = simulate_releases(artists, args, start)
+
+    # Scan du vendredi : tous les artistes d'un coup (une requête par artiste, en quelques minutes)
+    cron_hourly, cron_polls = Counter(), {}
+    for week in range(1, args.weeks + 1):
+        cron_hourly[week * 7 * 24] += args.artists
+        for artist in artists:
+            cron_polls.setdefault(artist['id'], []).append(start + week * WEEK)
+
+    # Mode service : passages étalés, au rythme de chaque artiste
+    path = os.path.join(tempfile.mkdtemp(prefix="bench-schedule-"), "state.db")
+    write_history(path, artists, args, start_dt)
+    scheduler = PollScheduler(artists, path, now=start)
+    daemon_hourly, daemon_polls = Counter(), {}
+    now = start
+    while now < start + args.weeks * WEEK:
+        due = scheduler.due(now, args.tick)
+        if due:
+            daemon_hourly[int((now - start) // HOUR)] += len(due)
+            for artist in due:
+                daemon_polls.setdefault(artist['id'], []).append(now)
+            scheduler.polled([artist['id'] for artist in due], now)
+        now += args.tick
+    scheduler.close()
+
+    n_releases = sum(len(times) for times in releases.values())
+    frequent = {artist['id'] for index, artist in enumerate(artists) if releases_per_week(index, args) >= 1}
+    print(f"{args.artists} artistes ({args.frequent:.0%} actifs), {args.weeks} semaine(s), {n_releases} sortie(s), "
+          f"{scheduler.weekly_polls:.0f} passage(s) par semaine en mode service")
+    print(f"{'mode':>20} {'requêtes/h':>10} {'pic/h':>8} {'délai médian':>13} {'délai p95':>10}   (heures)")
+    for name, hourly, polls in (("scan du vendredi", cron_hourly, cron_polls),
+                                ("mode service", daemon_hourly, daemon_polls)):
+        summary(name, delays(releases, polls), hourly, hours + 1)
+        active = {artist_id: times for artist_id, times in releases.items() if artist_id in frequent}
+        summary("dont actifs", delays(active, polls))
+
+
+if __name__ == '__main__':
+    main()
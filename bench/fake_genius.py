@@ -0,0 +1,99 @@
+"""
+Faux serveur Genius local pour les benchmarks hors-ligne.
+
+Imite les trois racines utilisées par lyricsgenius : l'API authentifiée
+(/v1/search, /v1/songs/{id}, /v1/artists/{id}), l'API publique
+(/api/search/multi) et les pages web (paroles). Chaque recherche renvoie un
+résultat déterministe ; les recherches « titre artiste » sont découpées sur le
+nom d'artiste synthétique ('Artiste 12') du faux catalogue Spotify.
+"""
+import re
+import zlib
+
+from bench.fake_http import FakeHttpServer
+
+SYNTHETIC_ARTIST = re.compile(r'^(.*?)\s*(Artiste \d+)$')
+
+
+class FakeGenius(FakeHttpServer):
+
+    def __init__(self, latency=0.0, throttle_every=0, retry_after=0.2):
+        super().__init__(latency, throttle_every, retry_after)
+        self.songs = {}     # song_id -> song, pour /songs/{id}
+        self.artists = {}   # artist_id -> artist, pour /artists/{id}
+        self.routes = [
+            ('GET', re.compile(r'^/api/search/multi/?$'), self._search_multi),
+            ('GET', re.compile(r'^/v1/search/?$'), self._search),
+            ('GET', re.compile(r'^/v1/songs/(\d+)/?$'), self._song),
+            ('GET', re.compile(r'^/v1/artists/(\d+)/?$'), self._artist),
+            ('GET', re.compile(r'^/([\w-]+-lyrics)$'), self._lyrics_page),
+        ]
+
+    def configure(self, genius):
+        """Pointe un client lyricsgenius sur ce serveur."""
+        genius.API_ROOT = f"{self.base_url}v1/"
+        genius.PUBLIC_API_ROOT = f"{self.base_url}api/"
+        genius.WEB_ROOT = self.base_url
+        return genius
+
+    # ----- Données synthétiques -----
+    @staticmethod
+    def _slug(text):
+        return re.sub(r'[^a-z0-9]+', '-', text.lower()).strip('-')
+
+    def _make_artist(self, name):
+        artist_id = zlib.crc32(name.encode()) % 10 ** 7
+        artist = {'id': artist_id, 'name': name, 'api_path': f"/artists/{artist_id}",
+                  'url': f"https://genius.com/artists/{self._slug(name)}",
+                  'image_url': '', 'header_image_url': '', 'is_meme_verified': False, 'is_verified': False,
+                  'description': {'plain': f"{name} est un artiste synthétique du benchmark.\nDeuxième paragraphe."}}
+        with self._lock:
+            self.artists[artist_id] = artist
+        return artist
+
+    def _make_song(self, title, artist_name):
+        song_id = zlib.crc32(f"{title}|{artist_name}".encode()) % 10 ** 7
+        path = f"{self._slug(artist_name)}-{self._slug(title)}-lyrics"
+        song = {'id': song_id, 'title': title, 'full_title': f"{title} by {artist_name}",
+                'primary_artist': self._make_artist(artist_name), 'lyrics_state': 'complete',
+                'api_path': f"/songs/{song_id}", 'path': f"/{path}", 'url': f"https://genius.com/{path}",
+                'release_date': '2001-01-01',
+                'description_annotation': {'annotations': [{'body': {'plain': (
+                    f"« {title} » est un morceau synthétique servi par le faux Genius, avec une "
+                    f"annotation assez longue pour être reprise dans le mail.")}}]}}
+        with self._lock:
+            self.songs[song_id] = song
+        return song
+
+    def _hits(self, query):
+        match = SYNTHETIC_ARTIST.match(query.get('q', '').strip())
+        if not match:
+            return [], []
+        title, artist_name = match.groups()
+        artist = self._make_artist(artist_name)
+        song = self._make_song(title or artist_name, artist_name)
+        return ([{'index': 'song', 'type': 'song', 'result': song}],
+                [{'index': 'artist', 'type': 'artist', 'result': artist}])
+
+    # ----- Routes -----
+    def _search_multi(self, query, _body):
+        songs, artists = self._hits(query)
+        return 200, {'response': {'sections': [
+            {'type': 'top_hit', 'hits': songs[:1]},
+            {'type': 'song', 'hits': songs},
+            {'type': 'artist', 'hits': artists},
+        ]}}
+
+    def _search(self, query, _body):
+        songs, _ = self._hits(query)
+        return 200, {'response': {'hits': songs}}
+
+    def _song(self, query, _body, song_id):
+        return 200, {'response': {'song': self.songs[int(song_id)]}}
+
+    def _artist(self, query, _body, artist_id):
+        return 200, {'response': {'artist': self.artists[int(artist_id)]}}
+
+    def _lyrics_page(self, query, _body, path):
+        return 200, ("<html><body><div data-lyrics-container=\"true\">"
+                     "Couplet synthétique<br>Refrain synthétique</div></body></html>")
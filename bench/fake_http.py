@@ -0,0 +1,110 @@
+"""
+Socle commun des faux serveurs HTTP locaux (Spotify, Genius) : routage par
+regex, latence configurable, injection de 429 avec header Retry-After et
+comptage des requêtes par route.
+"""
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+class FakeHttpServer:
+    """
+    Serveur HTTP local dont les sous-classes déclarent `self.routes` :
+    une liste de (méthode, regex du chemin, handler(query, body, *groupes)) ;
+    un handler retourne (statut, corps), le corps étant du JSON ou du texte (HTML).
+    `latency` : délai (s) ajouté à chaque réponse.
+    `throttle_every` : renvoie un 429 toutes les N requêtes (0 = jamais).
+    """
+
+    def __init__(self, latency=0.0, throttle_every=0, retry_after=0.2):
+        self.latency = latency
+        self.throttle_every = throttle_every
+        self.retry_after = retry_after
+        self.requests = Counter()   # nombre de requêtes par route
+        self.throttled = 0
+        self.routes = []
+        self.base_url = None
+        self._count = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    # ----- Cycle de vie -----
+    def start(self):
+        """Démarre le serveur sur un port libre ; retourne son URL de base ('http://127.0.0.1:<port>/')."""
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive, comme les API réelles
+            disable_nagle_algorithm = True  # headers et corps partent dans deux écritures
+
+            def do_GET(self):
+                fake._handle(self)
+
+            def do_POST(self):
+                fake._handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        class Server(ThreadingHTTPServer):
+            request_queue_size = 256  # éviter les SYN perdus quand tous les workers se connectent d'un coup
+
+        self._server = Server(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self._server.server_address[1]}/"
+        return self.base_url
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+    @property
+    def total_requests(self):
+        return sum(self.requests.values())
+
+    # ----- Traitement des requêtes -----
+    def _handle(self, handler):
+        url = urlparse(handler.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        length = int(handler.headers.get('Content-Length') or 0)
+        body = json.loads(handler.rfile.read(length)) if length else None
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self._count += 1
+            throttle = self.throttle_every and self._count % self.throttle_every == 0
+            if throttle:
+                self.throttled += 1
+        if throttle:
+            return self._send(handler, 429, {'error': {'status': 429, 'message': 'API rate limit exceeded'}},
+                              headers={'Retry-After': str(self.retry_after)})
+        for method, pattern, route in self.routes:
+            match = pattern.match(url.path)
+            if match and method == handler.command:
+                with self._lock:
+                    self.requests[route.__name__.lstrip('_')] += 1
+                try:
+                    status, response = route(query, body, *match.groups())
+                except KeyError:
+                    status, response = 404, {'error': {'status': 404, 'message': 'Not found'}}
+                return self._send(handler, status, response)
+        self._send(handler, 404, {'error': {'status': 404, 'message': f'Unknown route {url.path}'}})
+
+    def _send(self, handler, status, body, headers=None):
+        if isinstance(body, str):
+            payload, content_type = body.encode(), 'text/html; charset=utf-8'
+        else:
+            payload, content_type = json.dumps(body).encode(), 'application/json'
+        handler.send_response(status)
+        handler.send_header('Content-Type', content_type)
+        handler.send_header('Content-Length', str(len(payload)))
+        for key, value in (headers or {}).items():
+            handler.send_header(key, value)
+        handler.end_headers()
+        handler.wfile.write(payload)
@@ -0,0 +1,108 @@
+"""
+Faux serveur SMTP local pour les benchmarks hors-ligne.
+
+Accepte EHLO, AUTH (PLAIN / LOGIN, n'importe quel mot de passe), MAIL, RCPT,
+DATA, RSET, NOOP et QUIT, avec une latence configurable par réponse. Pas de
+STARTTLS : le bot doit tourner avec SMTP_STARTTLS=false. Les messages reçus
+sont seulement comptés.
+
+Pour tester les nouveaux essais : `fail_every` refuse un message sur N avec
+une erreur temporaire (451), `drop_every` coupe la connexion sans répondre.
+"""
+import socketserver
+import threading
+import time
+from collections import Counter
+
+
+class FakeSMTP:
+
+    def __init__(self, latency=0.0, fail_every=0, drop_every=0):
+        self.latency = latency
+        self.fail_every = fail_every
+        self.drop_every = drop_every
+        self._received = 0
+        self.stats = Counter()   # connexions, logins, messages, octets
+        self.host = '127.0.0.1'
+        self.port = None
+        self._lock = threading.Lock()
+        self._server = None
+
+    def start(self):
+        """Démarre le serveur sur un port libre ; retourne (hôte, port)."""
+        fake = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                fake._session(self.rfile, self.wfile)
+
+        class Server(socketserver.ThreadingTCPServer):
+            daemon_threads = True
+            allow_reuse_address = True
+
+        self._server = Server((self.host, 0), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        self.port = self._server.server_address[1]
+        return self.host, self.port
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def _count(self, key, value=1):
+        with self._lock:
+            self.stats[key] += value
+
+    def _session(self, rfile, wfile):
+        def reply(line):
+            if self.latency:
+                time.sleep(self.latency)
+            wfile.write(f"{line}\r\n".encode())
+            wfile.flush()
+
+        self._count('connexions')
+        reply("220 fake-smtp ESMTP")
+        while True:
+            line = rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors='replace').strip()
+            verb = command.split(' ', 1)[0].upper()
+            if verb in ('EHLO', 'HELO'):
+                reply("250-fake-smtp\r\n250-AUTH PLAIN LOGIN\r\n250-8BITMIME\r\n250 SIZE 35882577")
+            elif verb == 'AUTH':
+                if command.upper().startswith('AUTH LOGIN'):
+                    reply("334 VXNlcm5hbWU6")
+                    rfile.readline()
+                    reply("334 UGFzc3dvcmQ6")
+                    rfile.readline()
+                self._count('logins')
+                reply("235 2.7.0 Authentication successful")
+            elif verb in ('MAIL', 'RCPT', 'RSET', 'NOOP'):
+                reply("250 OK")
+            elif verb == 'DATA':
+                reply("354 End data with <CR><LF>.<CR><LF>")
+                size = 0
+                for data_line in iter(rfile.readline, b''):
+                    if data_line in (b".\r\n", b".\n"):
+                        break
+                    size += len(data_line)
+                with self._lock:
+                    self._received += 1
+                    received = self._received
+                if self.drop_every and received % self.drop_every == 0:
+                    self._count('coupures')
+                    return
+                if self.fail_every and received % self.fail_every == 0:
+                    self._count('refus')
+                    reply("451 4.3.0 Temporary failure, try again later")
+                    continue
+                self._count('messages')
+                self._count('octets', size)
+                reply("250 OK: queued")
+            elif verb == 'QUIT':
+                reply("221 Bye")
+                return
+            else:
+                reply("502 Command not implemented")
@@ -0,0 +1,315 @@
+"""
+Faux serveur Spotify local pour les benchmarks hors-ligne.
+
+Sert un catalogue synthétique (artistes, albums, pistes, podcasts) avec une latence
+configurable et une injection de 429 (avec header Retry-After), pour mesurer
+le scan sans identifiants ni quota réel.
+"""
+import re
+import threading
+from datetime import datetime, timedelta
+
+from bench.fake_http import FakeHttpServer
+
+# Comme les vraies réponses : chaque album et chaque piste listent ~185 marchés et quelques images
+MARKETS = [f"{a}{b}" for a in "ABCDEFGHIJKLMNOPRSTUVZ" for b in "ABCDEFGHI"][:185]
+
+
+class FakeCatalog:
+    """
+    Catalogue synthétique et déterministe : `n_artists` artistes, dont une partie a sorti
+    quelque chose cette semaine, et `n_shows` podcasts. Une piste sur trois a un invité
+    (featuring) pris parmi un vivier d'artistes non suivis, une sur cinq un autre artiste
+    du catalogue (visible seulement dans le flux des nouveautés). Albums, pistes et épisodes sont
+    calculés à la demande à partir de leur ID : même à 50 000 artistes, seule la liste
+    des artistes est gardée en mémoire.
+    """
+
+    def __init__(self, n_artists, albums_per_artist=12, recent_every=4, tracks_per_album=8,
+                 n_shows=20, episodes_per_show=20):
+        self.today = datetime.today()
+        self.albums_per_artist = albums_per_artist
+        self.recent_every = recent_every
+        self.tracks_per_album = tracks_per_album
+        self.episodes_per_show = episodes_per_show
+        self.artists = [{'artist': f"Artiste {i}", 'id': f"ar{i:05d}"} for i in range(n_artists)]
+        self.n_guests = max(5, n_artists // 20)
+        self.shows = [{'podcast': f"Podcast {s}", 'id': f"sh{s:05d}"} for s in range(n_shows)]
+
+    @staticmethod
+    def _index(prefix, item_id, n_items):
+        """Numéro encodé dans un ID 'ar00012' / 'sh00003' (KeyError si inconnu)."""
+        if not item_id.startswith(prefix) or not item_id[len(prefix):].isdigit():
+            raise KeyError(item_id)
+        index = int(item_id[len(prefix):])
+        if index >= n_items:
+            raise KeyError(item_id)
+        return index
+
+    def discography(self, artist_id):
+        """IDs des albums de l'artiste, dans l'ordre Spotify : les albums puis les singles, du plus récent au plus ancien."""
+        i = self._index('ar', artist_id, len(self.artists))
+        ids = [f"al{i:05d}x{j:03d}" for j in range(self.albums_per_artist)]
+        return [a for a in ids if self.album_group(a) == 'album'] + [a for a in ids if self.album_group(a) != 'album']
+
+    @staticmethod
+    def album_group(album_id):
+        return 'album' if int(album_id[-3:]) % 3 == 0 else 'single'
+
+    def album(self, album_id):
+        """Album complet (format Spotify simplifié) avec ses pistes."""
+        artist_id, _, j = album_id.partition('x')
+        if not artist_id.startswith('al') or not j.isdigit() or int(j) >= self.albums_per_artist:
+            raise KeyError(album_id)
+        i = self._index('al', artist_id, len(self.artists))
+        j = int(j)
+        artist = self.artists[i]
+        # Un artiste sur `recent_every` a une sortie datée d'il y a 2 jours
+        age = 2 if (j == 0 and i % self.recent_every == 0) else 30 * (j + 1)
+        album_type = self.album_group(album_id)
+        n_tracks = self.tracks_per_album if album_type == 'album' else 1
+        credits = [{'id': artist['id'], 'name': artist['artist']}]
+        return {
+            'id': album_id,
+            'name': f"Projet {j} de {artist['artist']}",
+            'album_type': album_type,
+            'album_group': album_type,
+            'release_date': (self.today - timedelta(days=age)).strftime("%Y-%m-%d"),
+            'artists': credits,
+            'available_markets': MARKETS,
+            'images': [{'url': f"https://i.scdn.co/image/{album_id}-{size}", 'height': size, 'width': size}
+                       for size in (640, 300, 64)],
+            'tracks': [
+                {'id': f"tr{album_id}n{k:02d}",
+                 'uri': f"spotify:track:tr{album_id}n{k:02d}",
+                 'name': f"Titre {k} ({album_id})",
+                 'artists': credits + self._guests(i, j, k),
+                 'available_markets': MARKETS,
+                 'duration_ms': 180000 + 1000 * k,
+                 'external_urls': {'spotify': f"https://open.spotify.com/track/tr{album_id}n{k:02d}"}}
+                for k in range(n_tracks)
+            ],
+        }
+
+    def _guests(self, i, j, k):
+        """Invités éventuels de la piste k de l'album j de l'artiste i."""
+        guests = []
+        if (i + j + k) % 3 == 0:
+            g = (i * 7 + j * 3 + k) % self.n_guests
+            guests.append({'id': f"gu{g:05d}", 'name': f"Invité {g}"})
+        f = (i * 13 + k + 1) % len(self.artists)
+        if (i + j + k) % 5 == 1 and f != i:
+            guests.append({'id': self.artists[f]['id'], 'name': self.artists[f]['artist']})
+        return guests
+
+    def new_releases(self):
+        """Sorties de la semaine, de la plus récente à la plus ancienne (résumés d'albums)."""
+        return [self.album_summary(f"al{i:05d}x000") for i in range(0, len(self.artists), self.recent_every)]
+
+    def track(self, track_id):
+        """Piste complète (ou None si inconnue), à partir de son ID 'tr<album_id>n<k>'."""
+        try:
+            album = self.album(track_id[2:].rsplit('n', 1)[0])
+        except (KeyError, ValueError):
+            return None
+        for track in album['tracks']:
+            if track['id'] == track_id:
+                return track
+        return None
+
+    def album_summary(self, album_id):
+        album = self.album(album_id)
+        return {k: v for k, v in album.items() if k != 'tracks'}
+
+    def episodes(self, show_id):
+        """Épisodes du podcast, du plus récent au plus ancien (un par semaine)."""
+        s = self._index('sh', show_id, len(self.shows))
+        return [{'id': f"ep{s:05d}x{e:03d}",
+                 'name': f"Épisode {self.episodes_per_show - e} de {self.shows[s]['podcast']}",
+                 'release_date': (self.today - timedelta(days=7 * e + s % 3)).strftime("%Y-%m-%d"),
+                 'release_date_precision': 'day'}
+                for e in range(self.episodes_per_show)]
+
+    def top_tracks(self, artist_id):
+        """
+        Titres les plus écoutés : pour un artiste du catalogue, la première piste
+        de chacun de ses derniers projets ; pour un invité, des titres à lui.
+        """
+        if artist_id.startswith('gu'):
+            g = self._index('gu', artist_id, self.n_guests)
+            credits = [{'id': artist_id, 'name': f"Invité {g}"}]
+            return [{'id': f"trgu{g:05d}n{k:02d}", 'uri': f"spotify:track:trgu{g:05d}n{k:02d}",
+                     'name': f"Tube {k} de Invité {g}", 'artists': credits,
+                     'album': {'id': f"algu{g:05d}n{k:02d}"},
+                     'external_urls': {'spotify': f"https://open.spotify.com/track/trgu{g:05d}n{k:02d}"}}
+                    for k in range(5)]
+        tracks = []
+        for album_id in self.discography(artist_id)[:5]:
+            album = self.album(album_id)
+            tracks.append(dict(album['tracks'][0], album={'id': album_id}))
+        return tracks
+
+    def classics(self, n):
+        """Catalogue au format classics_hiphop.json, tiré des albums synthétiques."""
+        step = max(1, len(self.artists) // n)
+        return [{'album': f"Projet 3 de {self.artists[i]['artist']}", 'artist': self.artists[i]['artist'],
+                 'id': f"al{i:05d}x003", 'year': 2000 + rank % 25}
+                for rank, i in enumerate(range(0, len(self.artists), step)) if rank < n]
+
+    def best_songs(self, n):
+        """Catalogue au format best_songs_21st_century.json, tiré des pistes synthétiques."""
+        step = max(1, len(self.artists) // n)
+        return [{'song': f"Titre 0 (al{i:05d}x006)", 'artist': self.artists[i]['artist'],
+                 'id': f"tral{i:05d}x006n00", 'year': 2000 + rank % 25}
+                for rank, i in enumerate(range(0, len(self.artists), step)) if rank < n]
+
+
+class FakeSpotify(FakeHttpServer):
+    """
+    Serveur HTTP local qui imite le sous-ensemble de l'API Spotify utilisé par le bot.
+    `latency` : délai (s) ajouté à chaque réponse.
+    `throttle_every` : renvoie un 429 toutes les N requêtes (0 = jamais).
+    """
+
+    def __init__(self, catalog, latency=0.0, throttle_every=0, retry_after=0.2):
+        super().__init__(latency, throttle_every, retry_after)
+        self.catalog = catalog
+        self.prefix = None
+        self._current = threading.local()  # token de la requête en cours (un utilisateur par token)
+        self.playlists = {}  # playlist_id -> {'playlist': ..., 'uris': [...]}
+        self.routes = [
+            ('GET', re.compile(r'^/v1/artists/(\w+)/albums$'), self._artist_albums),
+            ('GET', re.compile(r'^/v1/artists/(\w+)/top-tracks/?$'), self._artist_top_tracks),
+            ('GET', re.compile(r'^/v1/albums/(\w+)/tracks/?$'), self._album_tracks),
+            ('GET', re.compile(r'^/v1/albums/?$'), self._albums),
+            ('GET', re.compile(r'^/v1/tracks/?$'), self._tracks),
+            ('GET', re.compile(r'^/v1/shows/(\w+)/episodes/?$'), self._show_episodes),
+            ('GET', re.compile(r'^/v1/search/?$'), self._search),
+            ('GET', re.compile(r'^/v1/browse/new-releases/?$'), self._new_releases),
+            ('GET', re.compile(r'^/v1/me/?$'), self._me),
+            ('GET', re.compile(r'^/v1/me/playlists/?$'), self._my_playlists),
+            ('POST', re.compile(r'^/v1/users/([\w-]+)/playlists/?$'), self._create_playlist),
+            ('GET', re.compile(r'^/v1/playlists/(\w+)/(?:items|tracks)/?$'), self._playlist_items),
+            ('POST', re.compile(r'^/v1/playlists/(\w+)/(?:items|tracks)/?$'), self._add_playlist_items),
+        ]
+
+    def start(self):
+        """Démarre le serveur ; retourne le préfixe de l'API ('http://127.0.0.1:<port>/v1/')."""
+        self.prefix = f"{super().start()}v1/"
+        return self.prefix
+
+    def client(self, prefix, http=None):
+        """Client spotipy pointé sur ce serveur (même pool HTTP que app.py)."""
+        from spotipy import Spotify
+        from http_pool import HttpPool
+        sp = Spotify(auth="fake-token", requests_session=(http or HttpPool()).session())
+        sp.prefix = prefix
+        return sp
+
+    def _page(self, items, query, path):
+        """Page au format Spotify, avec un lien `next` absolu s'il reste des éléments."""
+        limit = int(query.get('limit', 20))
+        offset = int(query.get('offset', 0))
+        page = items[offset:offset + limit]
+        next_url = None
+        if offset + limit < len(items):
+            next_url = f"{self.prefix}{path}?offset={offset + limit}&limit={limit}"
+        return {'items': page, 'limit': limit, 'offset': offset,
+                'total': len(items), 'next': next_url}
+
+    # ----- Routes -----
+    def _artist_albums(self, query, _body, artist_id):
+        groups = query.get('include_groups', 'album,single').split(',')
+        ids = [a for a in self.catalog.discography(artist_id) if self.catalog.album_group(a) in groups]
+        path = f"artists/{artist_id}/albums"
+        page = self._page([self.catalog.album_summary(a) for a in ids], query, path)
+        if page['next']:
+            page['next'] += f"&include_groups={','.join(groups)}"
+        return 200, page
+
+    def _artist_top_tracks(self, query, _body, artist_id):
+        return 200, {'tracks': self.catalog.top_tracks(artist_id)}
+
+    def _album_tracks(self, query, _body, album_id):
+        return 200, self._page(self.catalog.album(album_id)['tracks'], query, f"albums/{album_id}/tracks")
+
+    def _full_album(self, album_id):
+        try:
+            album = self.catalog.album(album_id)
+        except KeyError:
+            return None
+        full = {k: v for k, v in album.items() if k != 'tracks'}
+        full['external_urls'] = {'spotify': f"https://open.spotify.com/album/{album_id}"}
+        full['uri'] = f"spotify:album:{album_id}"
+        full['tracks'] = self._page(album['tracks'], {'limit': 50}, f"albums/{album_id}/tracks")
+        return full
+
+    def _albums(self, query, _body):
+        ids = query['ids'].split(',')
+        if len(ids) > 20:
+            return 400, {'error': {'status': 400, 'message': 'Too many ids requested'}}
+        return 200, {'albums': [self._full_album(album_id) for album_id in ids]}
+
+    def _tracks(self, query, _body):
+        ids = query['ids'].split(',')
+        if len(ids) > 50:
+            return 400, {'error': {'status': 400, 'message': 'Too many ids requested'}}
+        return 200, {'tracks': [self.catalog.track(track_id) for track_id in ids]}
+
+    def _show_episodes(self, query, _body, show_id):
+        return 200, self._page(self.catalog.episodes(show_id), query, f"shows/{show_id}/episodes")
+
+    def _search(self, query, _body):
+        # Seule la recherche du flux (`tag:new`) est servie, bornée à 1000 résultats comme Spotify
+        if query.get('q') != 'tag:new' or query.get('type') != 'album':
+            return 400, {'error': {'status': 400, 'message': 'Unsupported search'}}
+        if int(query.get('offset', 0)) >= 1000:
+            return 400, {'error': {'status': 400, 'message': 'Invalid offset'}}
+        releases = self.catalog.new_releases()
+        page = self._page(releases[:1000], query, "search")
+        page['total'] = len(releases)
+        if page['next']:
+            page['next'] += "&q=tag:new&type=album"
+        return 200, {'albums': page}
+
+    def _new_releases(self, query, _body):
+        # Une sélection éditoriale : les 100 premières sorties
+        return 200, {'albums': self._page(self.catalog.new_releases()[:100], query, "browse/new-releases")}
+
+    def _handle(self, handler):
+        self._current.token = handler.headers.get('Authorization', '').removeprefix('Bearer ')
+        super()._handle(handler)
+
+    def _user(self):
+        """Utilisateur du token : 'fake-token' -> 'fakeuser', 'fake-token-alice' -> 'fakeuser-alice'."""
+        suffix = self._current.token.removeprefix('fake-token')
+        return {'id': f"fakeuser{suffix}", 'display_name': f"Fake User{suffix}"}
+
+    def _me(self, query, _body):
+        return 200, self._user()
+
+    def _my_playlists(self, query, _body):
+        # Spotify liste les playlists de la plus récente à la plus ancienne
+        user_id = self._user()['id']
+        playlists = [entry['playlist'] for entry in reversed(list(self.playlists.values()))
+                     if entry['playlist']['owner']['id'] == user_id]
+        return 200, self._page(playlists, query, "me/playlists")
+
+    def _create_playlist(self, query, body, user_id):
+        with self._lock:
+            playlist_id = f"pl{len(self.playlists):05d}"
+            playlist = {'id': playlist_id, 'name': body['name'], 'owner': {'id': user_id},
+                        'external_urls': {'spotify': f"https://open.spotify.com/playlist/{playlist_id}"}}
+            self.playlists[playlist_id] = {'playlist': playlist, 'uris': []}
+        return 201, playlist
+
+    def _playlist_items(self, query, _body, playlist_id):
+        uris = self.playlists[playlist_id]['uris']
+        return 200, self._page([{'track': {'uri': uri}} for uri in uris], query, f"playlists/{playlist_id}/items")
+
+    def _add_playlist_items(self, query, body, playlist_id):
+        if len(body) > 100:
+            return 400, {'error': {'status': 400, 'message': 'You can add a maximum of 100 tracks per request.'}}
+        with self._lock:
+            self.playlists[playlist_id]['uris'].extend(body)
+        return 201, {'snapshot_id': f"snap{len(self.playlists[playlist_id]['uris'])}"}
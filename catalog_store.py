@@ -0,0 +1,120 @@
+"""
+Catalogues précalculés (classiques hip-hop, sons du siècle) : chaque entrée est
+rangée à une position fixe avec son URL et son URI Spotify déjà résolus, et
+l'enrichissement Genius quand il est connu.
+
+Le tirage de la semaine (positions données par rotation.py) se lit par clé
+primaire : aucun appel réseau, et rien n'est chargé en mémoire à part les
+entrées tirées, même pour des catalogues de plusieurs centaines de milliers
+d'entrées.
+
+Le store est construit une fois depuis les fichiers JSON :
+    python app.py --build-catalogs [--with-genius]
+"""
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+DEFAULT_CATALOG_STORE_PATH = os.getenv("CATALOG_STORE_PATH", "catalog.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS catalogs (
+    name TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    built_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    catalog TEXT NOT NULL,
+    position INTEGER NOT NULL,     -- 0 .. size - 1, sans trou
+    item_id TEXT NOT NULL,         -- ID Spotify de l'album ou de la piste
+    data TEXT NOT NULL,            -- entrée JSON d'origine (artiste, titre, année...)
+    url TEXT NOT NULL,
+    uri TEXT NOT NULL,
+    genius TEXT,                   -- JSON, ou NULL si pas encore enrichi
+    PRIMARY KEY (catalog, position)
+) WITHOUT ROWID;
+"""
+
+
+class CatalogStore:
+    """Store SQLite des catalogues ; une connexion partagée entre threads, protégée par un verrou."""
+
+    def __init__(self, path=DEFAULT_CATALOG_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        self._sizes = dict(self._db.execute("SELECT name, size FROM catalogs"))
+
+    @classmethod
+    def open_existing(cls, path=DEFAULT_CATALOG_STORE_PATH):
+        """Ouvre le store s'il a été construit, sinon retourne None (le bot retombe sur les JSON)."""
+        return cls(path) if os.path.exists(path) else None
+
+    # ----- Lecture -----
+    def size(self, name):
+        """Nombre d'entrées du catalogue (0 s'il n'a pas été construit)."""
+        return self._sizes.get(name, 0)
+
+    def get(self, name, positions):
+        """Retourne les entrées aux positions demandées, dans le même ordre."""
+        positions = list(positions)
+        placeholders = ', '.join('?' * len(positions))
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT position, item_id, data, url, uri, genius FROM entries "
+                f"WHERE catalog = ? AND position IN ({placeholders})", (name, *positions)).fetchall()
+        by_position = {row[0]: row for row in rows}
+        return [self._entry(name, *by_position[position]) for position in positions if position in by_position]
+
+    @staticmethod
+    def _entry(name, position, item_id, data, url, uri, genius):
+        entry = json.loads(data)
+        entry.update(id=item_id, url=url, uri=uri, genius_info=json.loads(genius) if genius else None,
+                     catalog=name, position=position)
+        return entry
+
+    # ----- Écriture -----
+    def replace(self, name, rows):
+        """
+        Reconstruit un catalogue depuis un itérable de (entrée JSON, url, uri),
+        en une seule transaction : un run concurrent voit l'ancien ou le nouveau,
+        jamais un catalogue à moitié écrit. L'enrichissement Genius déjà connu
+        pour un même ID est conservé. Retourne le nombre d'entrées écrites.
+        """
+        with self._lock, self._db:
+            genius = dict(self._db.execute(
+                "SELECT item_id, genius FROM entries WHERE catalog = ? AND genius IS NOT NULL", (name,)))
+            self._db.execute("DELETE FROM entries WHERE catalog = ?", (name,))
+            size = 0
+            for entry, url, uri in rows:
+                item_id = entry['id']
+                data = {key: value for key, value in entry.items() if key != 'id'}
+                self._db.execute(
+                    "INSERT INTO entries (catalog, position, item_id, data, url, uri, genius) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (name, size, item_id, json.dumps(data, ensure_ascii=False), url, uri, genius.get(item_id)))
+                size += 1
+            self._db.execute("INSERT OR REPLACE INTO catalogs (name, size, built_at) VALUES (?, ?, ?)",
+                             (name, size, datetime.now().isoformat(timespec='seconds')))
+        self._sizes[name] = size
+        return size
+
+    def set_genius(self, name, position, info):
+        """Mémorise l'enrichissement Genius d'une entrée : les tirages suivants n'appellent plus Genius."""
+        with self._lock, self._db:
+            self._db.execute("UPDATE entries SET genius = ? WHERE catalog = ? AND position = ?",
+                             (json.dumps(info, ensure_ascii=False), name, position))
+
+    def missing_genius(self, name):
+        """Positions des entrées pas encore enrichies, avec leur entrée (pour --with-genius)."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT position, item_id, data, url, uri, genius FROM entries "
+                "WHERE catalog = ? AND genius IS NULL ORDER BY position", (name,)).fetchall()
+        return [self._entry(name, *row) for row in rows]
+
+    def close(self):
+        self._db.close()
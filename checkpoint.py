@@ -0,0 +1,130 @@
+"""
+Points de reprise d'un run : si le job s'arrête en route (timeout GitHub
+Actions pendant le scan, SMTP en panne à la fin), `python app.py --resume`
+repart de là où il s'était arrêté au lieu de tout refaire.
+
+Le run est découpé en étapes (scan → enrichissement → playlist → mail) et
+leurs résultats sont écrits dans le dossier CHECKPOINT_DIR :
+
+    run.json        étapes terminées (scan, enrichissement, playlist et mail
+                    de chaque profil), réécrit après chaque étape via un
+                    fichier temporaire : jamais de fichier à moitié écrit
+    artists.jsonl   une ligne par lot d'artistes scannés, ajoutée puis
+                    synchronisée sur disque ; une dernière ligne tronquée
+                    (run tué pendant l'écriture) est ignorée
+
+Un point de reprise ne vaut que pour la semaine et les profils du run qui
+l'a écrit, et il est effacé une fois le run terminé (mails partis, état
+mémorisé).
+"""
+import json
+import os
+import shutil
+from datetime import datetime
+
+from releases import Release
+
+DEFAULT_CHECKPOINT_DIR = os.getenv("CHECKPOINT_DIR", ".checkpoint")
+ARTIST_BATCH = 500   # artistes scannés entre deux points de reprise
+
+
+def run_key(today, profile_names):
+    """Identifiant du run : semaine ISO et profils (un point de reprise d'une autre semaine est ignoré)."""
+    return f"{today.strftime('%G-W%V')}:{','.join(sorted(profile_names))}"
+
+
+class Checkpoint:
+    """
+    Étapes terminées d'un run. Avec `path=None` (dry-run), rien n'est écrit
+    sur disque. Avec `resume=True`, un point de reprise du même run est
+    rechargé ; sinon, ou s'il vient d'un autre run, il est remplacé.
+    """
+
+    def __init__(self, key, today, path=DEFAULT_CHECKPOINT_DIR, resume=False):
+        self.path = path
+        self.stages = {}
+        self.resumed = False
+        self._data = {'key': key, 'today': today.isoformat(timespec='seconds'), 'stages': self.stages}
+        if path is None:
+            return
+        self._run_path = os.path.join(path, "run.json")
+        self._artists_path = os.path.join(path, "artists.jsonl")
+        if resume:
+            try:
+                with open(self._run_path) as f:
+                    data = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                data = None
+            if data and data.get('key') == key:
+                self._data, self.stages, self.resumed = data, data['stages'], True
+                return
+            if data:
+                print("ℹ️ Point de reprise d'un autre run ignoré")
+        self.clear()
+        os.makedirs(path, exist_ok=True)
+        self._write()
+
+    @property
+    def today(self):
+        """Date du run d'origine : une reprise le lendemain écrit toujours la même playlist HEBDO."""
+        return datetime.fromisoformat(self._data['today'])
+
+    def _write(self):
+        tmp_path = f"{self._run_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._data, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._run_path)
+
+    # ----- Étapes -----
+    def done(self, stage):
+        return stage in self.stages
+
+    def get(self, stage, default=None):
+        return self.stages.get(stage, default)
+
+    def save(self, stage, value):
+        """Marque l'étape comme terminée avec son résultat (doit être sérialisable en JSON)."""
+        self.stages[stage] = value
+        if self.path is not None:
+            self._write()
+
+    # ----- Scan des artistes, par lots -----
+    def scanned_artists(self):
+        """Artistes déjà scannés par ce run : {ID : (sorties récentes en Release, erreur ou None)}."""
+        scanned = {}
+        if self.path is None or not self.resumed:
+            return scanned
+        try:
+            with open(self._artists_path, "r+b") as f:
+                valid = 0
+                for line in f:
+                    try:
+                        batch = json.loads(line)
+                    except json.JSONDecodeError:
+                        break
+                    valid += len(line)
+                    for artist_id, recent, error in batch:
+                        scanned[artist_id] = ([Release(*release) for release in recent], error)
+                # Couper la ligne tronquée : les lots suivants s'ajoutent après le dernier lot complet
+                f.truncate(valid)
+        except FileNotFoundError:
+            pass
+        return scanned
+
+    def add_artists(self, discoveries):
+        """Ajoute un lot de résultats de discover_releases au point de reprise."""
+        if self.path is None:
+            return
+        line = json.dumps([[artist['id'], [release.to_list() for release in recent], error]
+                           for artist, recent, error in discoveries], ensure_ascii=False)
+        with open(self._artists_path, "a") as f:
+            f.write(line + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def clear(self):
+        """Efface le point de reprise (run terminé)."""
+        if self.path is not None:
+            shutil.rmtree(self.path, ignore_errors=True)
@@ -0,0 +1,93 @@
+"""
+Étape d'enrichissement Genius, lancée en tâche de fond dès que les
+classiques et les sons du siècle sont tirés, avec une échéance globale.
+
+Le mail part à l'heure avec ce qui a fini à temps ; le reste retombe
+proprement sur genius_info=None. Les appels Genius tournent sur des threads
+démons : contrairement aux pools de concurrent.futures, joints à la sortie
+de l'interpréteur, un appel en retard ne retient pas la fin du process.
+"""
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, wait
+
+DEFAULT_WORKERS = 6
+DEFAULT_DEADLINE = float(os.getenv("GENIUS_DEADLINE", 60))  # secondes depuis le lancement de l'étape
+
+
+def _run(future, func, args):
+    if not future.set_running_or_notify_cancel():
+        return
+    try:
+        future.set_result(func(*args))
+    except BaseException as e:
+        future.set_exception(e)
+
+
+def spawn(func, *args):
+    """Lance `func(*args)` sur un thread démon et retourne son Future."""
+    future = Future()
+    threading.Thread(target=_run, args=(future, func, args), name='genius-spawn', daemon=True).start()
+    return future
+
+
+class EnrichmentStage:
+    """
+    Threads démons dédiés aux appels Genius, dont on relève les résultats avant
+    l'échéance. Les threads ne démarrent qu'avec les tâches et s'arrêtent dès
+    que la file est vide : une étape sans tâche (run repris, pas de token
+    Genius) ou jamais relevée ne laisse aucun thread derrière elle.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, deadline=DEFAULT_DEADLINE):
+        self.deadline = deadline
+        self.workers = workers
+        self._tasks = deque()
+        self._lock = threading.Lock()
+        self._running = 0
+        self._futures = {}
+        self._started_at = time.monotonic()
+
+    def _work(self):
+        while True:
+            with self._lock:
+                if not self._tasks:
+                    self._running -= 1
+                    return
+                task = self._tasks.popleft()
+            _run(*task)
+
+    def submit(self, key, func, *args):
+        """Lance `func(*args)` en tâche de fond ; son résultat sera rangé sous `key`."""
+        future = Future()
+        self._futures[key] = future
+        with self._lock:
+            self._tasks.append((future, func, args))
+            if self._running < self.workers:
+                self._running += 1
+                threading.Thread(target=self._work, name=f'genius_{self._running}', daemon=True).start()
+
+    def collect(self):
+        """
+        Attend les tâches jusqu'à l'échéance (comptée depuis la création de
+        l'étape) puis retourne {key: résultat} ; une tâche en retard ou en
+        erreur vaut None. Les tâches en retard sont abandonnées : celles pas
+        encore lancées sont annulées, celles en vol finissent (ou non) sans
+        retenir le run ni la sortie du process.
+        """
+        remaining = max(0.0, self._started_at + self.deadline - time.monotonic())
+        done, late = wait(self._futures.values(), timeout=remaining)
+        for future in late:
+            future.cancel()
+        results = {}
+        for key, future in self._futures.items():
+            if future in done and future.exception() is None:
+                results[key] = future.result()
+            else:
+                results[key] = None
+        if late:
+            print(f"⏱️ Enrichissement Genius : {len(late)}/{len(self._futures)} recherche(s) "
+                  f"abandonnée(s) après {self.deadline:g}s")
+        return results
@@ -0,0 +1,107 @@
+"""
+Cache disque (SQLite) des recherches Genius, avec durée de vie (TTL),
+cache des résultats négatifs et éviction LRU bornée en taille.
+
+Les mêmes classiques et artistes reviennent de semaine en semaine : une
+entrée déjà enrichie ne coûte plus aucun appel Genius tant qu'elle est valide.
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+DEFAULT_CACHE_PATH = os.getenv("GENIUS_CACHE_PATH", ".cache-genius.db")
+DEFAULT_TTL = 30 * 24 * 3600          # résultat trouvé : 30 jours
+DEFAULT_NEGATIVE_TTL = 3 * 24 * 3600  # rien trouvé : 3 jours, Genius peut l'ajouter entre-temps
+DEFAULT_MAX_ENTRIES = 5000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS genius (
+    key TEXT PRIMARY KEY,
+    value TEXT,                -- JSON, ou NULL pour un résultat négatif
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS genius_accessed ON genius (accessed_at);
+"""
+
+
+def normalize(text):
+    """Normalise un titre / nom d'artiste : minuscules, sans accents ni ponctuation."""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(c for c in text if not unicodedata.combining(c)).lower()
+    text = re.sub(r'[^\w\s]', ' ', text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+class GeniusCache:
+    """Cache partagé entre threads : une seule connexion SQLite protégée par un verrou."""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL, negative_ttl=DEFAULT_NEGATIVE_TTL,
+                 max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+
+    @staticmethod
+    def key(kind, title, artist):
+        return f"{kind}|{normalize(title)}|{normalize(artist)}"
+
+    def get(self, key):
+        """Retourne (trouvé, valeur) ; valeur vaut None pour un résultat négatif en cache."""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT value, expires_at FROM genius WHERE key = ?", (key,)).fetchone()
+            if row is None or row[1] < now:
+                self.misses += 1
+                return False, None
+            self.hits += 1
+            with self._db:
+                self._db.execute("UPDATE genius SET accessed_at = ? WHERE key = ?", (now, key))
+        return True, json.loads(row[0]) if row[0] is not None else None
+
+    def put(self, key, value):
+        """Enregistre une valeur (None = résultat négatif) et évince les entrées les moins récemment lues."""
+        now = time.time()
+        ttl = self.ttl if value is not None else self.negative_ttl
+        payload = json.dumps(value, ensure_ascii=False) if value is not None else None
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO genius (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, payload, now + ttl, now))
+            self._db.execute("DELETE FROM genius WHERE expires_at < ?", (now,))
+            self._db.execute(
+                "DELETE FROM genius WHERE key IN ("
+                "  SELECT key FROM genius ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+
+    def fetch(self, kind, title, artist, compute):
+        """
+        Retourne l'entrée en cache, sinon appelle `compute()`.
+        `compute` retourne (valeur, complet) : une valeur obtenue malgré une
+        erreur Genius (timeout, etc.) n'est pas mise en cache, pour être
+        retentée au prochain run.
+        """
+        key = self.key(kind, title, artist)
+        found, value = self.get(key)
+        if found:
+            return value
+        value, complete = compute()
+        if complete:
+            self.put(key, value)
+        return value
+
+    def summary(self):
+        total = self.hits + self.misses
+        return f"{self.hits} hit(s), {self.misses} miss(es) sur {total} recherche(s)"
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,176 @@
+"""
+Couche HTTP partagée par les clients Spotify et Genius : un seul pool de
+connexions keep-alive, des retries urllib3 avec backoff aléatoire (jitter),
+un plafond de requêtes simultanées par hôte, et un histogramme de latence
+par endpoint pour voir si le temps part chez Spotify ou chez Genius.
+"""
+import os
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from urllib.parse import urlparse
+
+import requests
+from urllib3.util.retry import Retry
+
+DEFAULT_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", 32))  # connexions gardées ouvertes par hôte
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.3        # secondes, doublé à chaque tentative
+DEFAULT_JITTER = 0.5         # secondes aléatoires ajoutées au backoff
+DEFAULT_HOST_LIMITS = {      # requêtes simultanées max par hôte
+    'api.spotify.com': 16,
+    'api.genius.com': 4,
+    'genius.com': 4,
+}
+LATENCY_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 15000)
+
+
+class JitteredRetry(Retry):
+    """Retry urllib3 dont le backoff est étalé aléatoirement, pour ne pas relancer tous les workers en même temps."""
+
+    jitter = DEFAULT_JITTER
+
+    def get_backoff_time(self):
+        backoff = super().get_backoff_time()
+        return backoff + random.uniform(0, self.jitter) if backoff else backoff
+
+
+class LatencyHistogram:
+    """Histogramme de latence à buckets fixes (en millisecondes)."""
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, ms):
+        index = next((i for i, bound in enumerate(LATENCY_BUCKETS_MS) if ms <= bound), len(LATENCY_BUCKETS_MS))
+        self.counts[index] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, p):
+        """Borne haute du bucket contenant le p-ième centile."""
+        threshold = p / 100 * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= threshold:
+                return LATENCY_BUCKETS_MS[index] if index < len(LATENCY_BUCKETS_MS) else self.max_ms
+        return 0.0
+
+
+def endpoint_name(method, url):
+    """'GET api.spotify.com /v1/albums/{id}/tracks' : les IDs sont remplacés pour regrouper les appels."""
+    parsed = urlparse(url)
+    segments = []
+    for segment in parsed.path.split('/'):
+        if len(segment) >= 16 or (len(segment) > 3 and any(c.isdigit() for c in segment)):
+            segment = '{id}'
+        segments.append(segment)
+    return f"{method} {parsed.hostname} {'/'.join(segments).rstrip('/') or '/'}"
+
+
+class PooledAdapter(requests.adapters.HTTPAdapter):
+    """Adapter partagé : plafond de concurrence par hôte et mesure de latence par endpoint."""
+
+    def __init__(self, host_limits=None, **kwargs):
+        super().__init__(**kwargs)
+        self.host_limits = dict(DEFAULT_HOST_LIMITS if host_limits is None else host_limits)
+        self.histograms = defaultdict(LatencyHistogram)
+        self.stats = defaultdict(Counter)  # endpoint -> requests, bytes, retries, http_429, errors
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    def _semaphore(self, host):
+        with self._lock:
+            if host not in self._semaphores:
+                limit = self.host_limits.get(host)
+                self._semaphores[host] = threading.BoundedSemaphore(limit) if limit else None
+            return self._semaphores[host]
+
+    def send(self, request, **kwargs):
+        semaphore = self._semaphore(urlparse(request.url).hostname)
+        if semaphore:
+            semaphore.acquire()
+        start = time.perf_counter()
+        response = None
+        try:
+            response = super().send(request, **kwargs)
+            if not kwargs.get('stream'):
+                response.content  # lire le corps ici pour le mesurer (requests le lirait juste après)
+            return response
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if semaphore:
+                semaphore.release()
+            name = endpoint_name(request.method, request.url)
+            with self._lock:
+                self.histograms[name].add(elapsed_ms)
+                stats = self.stats[name]
+                stats['requests'] += 1
+                if response is None:
+                    stats['errors'] += 1
+                else:
+                    stats['bytes'] += len(response.content) if not kwargs.get('stream') else 0
+                    stats['http_429'] += response.status_code == 429
+                    retries = getattr(response.raw, 'retries', None)
+                    stats['retries'] += len(retries.history) if retries else 0
+
+    def totals(self):
+        """Somme des compteurs de tous les endpoints."""
+        with self._lock:
+            return sum(self.stats.values(), Counter())
+
+
+class HttpPool:
+    """
+    Pool de connexions unique pour tout le run. Chaque client garde sa propre
+    session (headers, auth) mais toutes montent le même adapter, donc les
+    mêmes connexions keep-alive et les mêmes plafonds par hôte.
+    """
+
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, retries=DEFAULT_RETRIES, backoff_factor=DEFAULT_BACKOFF,
+                 host_limits=None):
+        # Les 429 ne sont pas rejoués ici : le RateLimiter du scanner les gère avec une
+        # horloge de backoff partagée entre tous les workers (header Retry-After)
+        retry = JitteredRetry(
+            total=retries,
+            read=False,
+            allowed_methods=frozenset(['GET', 'POST', 'PUT', 'DELETE']),
+            status=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(500, 502, 503, 504),
+            respect_retry_after_header=False)
+        self.adapter = PooledAdapter(host_limits=host_limits, pool_connections=8, pool_maxsize=pool_size,
+                                     max_retries=retry)
+
+    def mount(self, session):
+        """Branche une session existante sur le pool partagé."""
+        session.mount('http://', self.adapter)
+        session.mount('https://', self.adapter)
+        return session
+
+    def session(self):
+        """Nouvelle session branchée sur le pool partagé."""
+        return self.mount(requests.Session())
+
+    def print_latency_report(self, top=10):
+        """Affiche le temps passé par hôte puis les endpoints les plus coûteux (p50 / p95 / max)."""
+        with self.adapter._lock:
+            histograms = dict(self.adapter.histograms)
+        if not histograms:
+            return
+        by_host = defaultdict(float)
+        for name, histogram in histograms.items():
+            by_host[name.split(' ')[1]] += histogram.total_ms
+        total_ms = sum(by_host.values()) or 1.0
+        hosts = ', '.join(f"{host} {ms / 1000:.1f}s ({ms / total_ms:.0%})"
+                          for host, ms in sorted(by_host.items(), key=lambda item: -item[1]))
+        print(f"⏱️ Temps HTTP par hôte : {hosts}")
+        for name, histogram in sorted(histograms.items(), key=lambda item: -item[1].total_ms)[:top]:
+            print(f"   - {name} : {histogram.count} appel(s), p50 ≤{histogram.percentile(50):.0f}ms, "
+                  f"p95 ≤{histogram.percentile(95):.0f}ms, max {histogram.max_ms:.0f}ms")
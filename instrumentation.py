@@ -0,0 +1,113 @@
+"""
+Instrumentation d'un run : temps de chaque étape (scan des artistes, podcasts,
+recommandations, classiques, Genius, playlist, mail), et pour chacune le
+nombre d'appels API, de retries, de 429 et d'octets reçus. Si tracemalloc
+est actif (benchmarks), le pic de mémoire Python de chaque étape et du run.
+
+Le rapport est écrit en JSON (run-report.json par défaut) pour suivre les
+régressions d'une semaine à l'autre.
+"""
+import json
+import os
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+DEFAULT_REPORT_PATH = os.getenv("RUN_REPORT_PATH", "run-report.json")
+
+
+class RunReport:
+    """
+    Collecte les mesures d'un run. Les compteurs viennent du RateLimiter
+    (appels Spotify, 429) et du pool HTTP (requêtes, octets, retries) ; une
+    étape enregistre la différence entre le début et la fin de son bloc.
+    """
+
+    def __init__(self):
+        self.started_at = datetime.now()
+        self.stages = []
+        self.limiter = None      # RateLimiter du run, renseigné dès qu'il existe
+        self.http = None         # HttpPool du run
+        self.extra = {}          # autres infos (cache Genius, nombre de sorties, ...)
+        self.python_peak = 0     # pic de mémoire Python du run (octets), si tracemalloc est actif
+        self._start = time.perf_counter()
+
+    def _snapshot(self):
+        counters = Counter()
+        if self.limiter is not None:
+            counters['api_calls'] = sum(self.limiter.calls.values())
+            counters['http_429'] = self.limiter.throttled
+        if self.http is not None:
+            totals = self.http.adapter.totals()
+            counters['http_requests'] = totals['requests']
+            counters['bytes'] = totals['bytes']
+            counters['retries'] = totals['retries']
+        return counters
+
+    def _fold_peak(self):
+        """Reporte le pic tracemalloc courant dans le pic du run (avant une remise à zéro)."""
+        if tracemalloc.is_tracing():
+            self.python_peak = max(self.python_peak, tracemalloc.get_traced_memory()[1])
+
+    @contextmanager
+    def stage(self, name):
+        """Mesure le bloc `with` comme une étape du run."""
+        before = self._snapshot()
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            self._fold_peak()
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            after = self._snapshot()
+            after.subtract(before)
+            stage = {'stage': name, 'seconds': round(time.perf_counter() - start, 3),
+                     **{key: value for key, value in after.items() if value}}
+            if tracing:
+                stage['python_peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1)
+            self.stages.append(stage)
+
+    def to_dict(self):
+        self._fold_peak()
+        endpoints = {}
+        if self.http is not None:
+            with self.http.adapter._lock:
+                for name, stats in self.http.adapter.stats.items():
+                    histogram = self.http.adapter.histograms[name]
+                    endpoints[name] = {**stats, 'seconds': round(histogram.total_ms / 1000, 3),
+                                       'p50_ms': histogram.percentile(50), 'p95_ms': histogram.percentile(95),
+                                       'max_ms': round(histogram.max_ms, 1)}
+        return {
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'seconds': round(time.perf_counter() - self._start, 3),
+            'stages': self.stages,
+            'spotify_calls': dict(self.limiter.calls) if self.limiter is not None else {},
+            'endpoints': endpoints,
+            **({'python_peak_mb': round(self.python_peak / 2 ** 20, 1)} if self.python_peak else {}),
+            **self.extra,
+        }
+
+    def write(self, path=DEFAULT_REPORT_PATH):
+        """Écrit le rapport JSON (via un fichier temporaire, pour ne jamais laisser un rapport tronqué)."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        print(f"📝 Rapport du run écrit dans {path}")
+
+    def summary_lines(self):
+        """Quelques lignes lisibles pour le pied du mail."""
+        total = time.perf_counter() - self._start
+        lines = [f"Durée du run : {total:.1f}s"]
+        for stage in sorted(self.stages, key=lambda s: -s['seconds'])[:5]:
+            details = f"{stage['seconds']:.1f}s"
+            if stage.get('api_calls'):
+                details += f", {stage['api_calls']} appel(s)"
+            if stage.get('http_429'):
+                details += f", {stage['http_429']} 429"
+            lines.append(f"{stage['stage']} : {details}")
+        return lines
@@ -0,0 +1,128 @@
+"""
+Envoi des mails par lots : une seule connexion SMTP authentifiée (STARTTLS +
+login une fois) pour tous les messages d'un run, avec reconnexion et nouvel
+essai si le serveur coupe ou répond par une erreur temporaire (4xx).
+"""
+import smtplib
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+SEND_RETRIES = 3        # tentatives par message
+SEND_BACKOFF = 2.0      # secondes, doublées à chaque tentative
+SMTP_TIMEOUT = 30       # secondes
+
+
+def build_message(sender, to, subject, text_body, html_body=None):
+    msg = MIMEMultipart('alternative')
+    msg['From'] = sender
+    msg['To'] = to
+    msg['Subject'] = subject
+
+    # Partie texte (fallback)
+    msg.attach(MIMEText(text_body, 'plain'))
+
+    # Partie HTML (optionnelle)
+    if html_body:
+        msg.attach(MIMEText(html_body, 'html'))
+    return msg
+
+
+def _is_temporary(error):
+    """Coupure de connexion ou réponse 4xx : le même message peut être retenté."""
+    if isinstance(error, (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)):
+        return True
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in error.recipients.values())
+    return isinstance(error, smtplib.SMTPResponseException) and 400 <= error.smtp_code < 500
+
+
+class Mailer:
+    """
+    Connexion SMTP réutilisée pour un lot de messages :
+
+        with Mailer(host, port, user, password) as mailer:
+            for msg in messages:
+                mailer.send(msg)
+
+    La connexion n'est ouverte qu'au premier envoi. `deliveries` garde, pour
+    chaque message, le temps d'envoi, le nombre de tentatives et l'erreur éventuelle.
+    """
+
+    def __init__(self, host, port, user, password, starttls=True, retries=SEND_RETRIES, backoff=SEND_BACKOFF):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.retries = retries
+        self.backoff = backoff
+        self.connections = 0
+        self.deliveries = []
+        self._smtp = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _connect(self):
+        smtp = smtplib.SMTP(self.host, self.port, timeout=SMTP_TIMEOUT)
+        try:
+            if self.starttls:
+                smtp.starttls()
+            smtp.login(self.user, self.password)
+        except Exception:
+            smtp.close()
+            raise
+        self._smtp = smtp
+        self.connections += 1
+
+    def _drop(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.close()
+            finally:
+                self._smtp = None
+
+    def _reset(self):
+        """Après un refus 4xx la connexion reste utilisable (RSET) ; sinon elle est rouverte au prochain essai."""
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.rset()
+        except (smtplib.SMTPException, OSError):
+            self._drop()
+
+    def send(self, msg):
+        """Envoie un message sur la connexion du lot ; lève l'erreur si toutes les tentatives échouent."""
+        start = time.perf_counter()
+        delivery = {'attempts': 0, 'error': None}
+        try:
+            for attempt in range(self.retries):
+                delivery['attempts'] += 1
+                try:
+                    if self._smtp is None:
+                        self._connect()
+                    self._smtp.send_message(msg)
+                    return
+                except Exception as e:
+                    if not _is_temporary(e) or attempt == self.retries - 1:
+                        delivery['error'] = str(e)
+                        raise
+                    print(f"  ⚠️ Envoi du mail échoué, nouvel essai : {e}")
+                    self._reset()
+                    time.sleep(self.backoff * 2 ** attempt)
+        finally:
+            delivery['seconds'] = time.perf_counter() - start
+            self.deliveries.append(delivery)
+
+    def close(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            finally:
+                self._drop()
@@ -0,0 +1,68 @@
+"""
+Écriture idempotente de la playlist HEBDO de la semaine.
+
+Réutilise la playlist si un run précédent l'a déjà créée, ne rajoute que les
+URIs absentes, et envoie les ajouts par paquets de 100 (limite de l'API),
+chaque paquet étant retenté séparément. Relancer un run après un échec
+partiel ne coûte donc presque rien et ne crée pas de doublon.
+"""
+import time
+
+from scanner import iter_pages
+
+ITEMS_PER_CALL = 100      # limite de playlist_add_items
+BATCH_RETRIES = 3         # tentatives par paquet (les 429 sont gérés par le RateLimiter)
+BATCH_BACKOFF = 2.0       # secondes, doublées à chaque tentative
+
+
+class PlaylistWriter:
+
+    def __init__(self, sp, limiter, user_id):
+        self.sp = sp
+        self.limiter = limiter
+        self.user_id = user_id
+
+    def find_playlist(self, name):
+        """Playlist de l'utilisateur portant ce nom (la plus récente d'abord), ou None."""
+        first_page = self.limiter.call(self.sp.current_user_playlists, limit=50)
+        for playlist in iter_pages(self.sp, self.limiter, first_page):
+            if playlist and playlist['name'] == name and playlist['owner']['id'] == self.user_id:
+                return playlist
+        return None
+
+    def playlist_uris(self, playlist_id):
+        """URIs déjà présentes dans la playlist."""
+        first_page = self.limiter.call(self.sp.playlist_items, playlist_id,
+                                       fields='items(track(uri)),next', limit=100)
+        return {item['track']['uri'] for item in iter_pages(self.sp, self.limiter, first_page)
+                if item.get('track')}
+
+    def add_items(self, playlist_id, uris):
+        """Ajoute les URIs par paquets de 100, en retentant chaque paquet indépendamment."""
+        for start in range(0, len(uris), ITEMS_PER_CALL):
+            batch = uris[start:start + ITEMS_PER_CALL]
+            for attempt in range(BATCH_RETRIES):
+                try:
+                    self.limiter.call(self.sp.playlist_add_items, playlist_id=playlist_id, items=batch)
+                    break
+                except Exception as e:
+                    if attempt == BATCH_RETRIES - 1:
+                        raise
+                    print(f"  ⚠️ Ajout à la playlist échoué ({len(batch)} titres), nouvel essai : {e}")
+                    time.sleep(BATCH_BACKOFF * 2 ** attempt)
+
+    def write(self, name, uris):
+        """
+        Crée (ou reprend) la playlist `name` et y ajoute les URIs manquantes,
+        dans l'ordre donné. Retourne (playlist, nombre de titres ajoutés).
+        """
+        playlist = self.find_playlist(name)
+        if playlist:
+            present = self.playlist_uris(playlist['id'])
+            print(f"ℹ️ Playlist '{name}' déjà créée : {len(present)} titre(s) présent(s)")
+        else:
+            playlist = self.limiter.call(self.sp.user_playlist_create, user=self.user_id, name=name, public=False)
+            present = set()
+        missing = [uri for uri in dict.fromkeys(uris) if uri not in present]
+        self.add_items(playlist['id'], missing)
+        return playlist, len(missing)
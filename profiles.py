@@ -0,0 +1,73 @@
+"""
+Profils du mode multi-utilisateurs : chaque profil a ses artistes, ses
+podcasts, son adresse mail et son propre token Spotify (pour sa playlist).
+
+Le fichier de profils est une liste JSON :
+
+    [
+      {"name": "alice",
+       "artists": "alice/artists.json",
+       "podcasts": "alice/podcasts.json",
+       "email_to": "alice@example.com",
+       "refresh_token_env": "SPOTIPY_REFRESH_TOKEN_ALICE"}
+    ]
+
+Les chemins sont relatifs au fichier de profils. `podcasts` et
+`refresh_token_env` sont optionnels (par défaut : aucun podcast, et le token
+SPOTIPY_REFRESH_TOKEN du bot).
+"""
+import json
+import os
+
+DEFAULT_REFRESH_TOKEN_ENV = "SPOTIPY_REFRESH_TOKEN"
+
+
+class Profile:
+
+    def __init__(self, name, artists, podcasts, email_to, refresh_token_env=DEFAULT_REFRESH_TOKEN_ENV,
+                 clients=None):
+        self.name = name
+        self.artists = artists
+        self.podcasts = podcasts
+        self.email_to = email_to
+        self.refresh_token_env = refresh_token_env
+        self.clients = clients   # clients Spotify du profil, créés au premier usage par app.run
+
+    def __repr__(self):
+        return f"Profile({self.name!r}, {len(self.artists)} artistes, {len(self.podcasts)} podcasts)"
+
+
+def _load_list(base_dir, path):
+    if not path:
+        return []
+    with open(os.path.join(base_dir, path), "r") as f:
+        return json.load(f)
+
+
+def load_profiles(path):
+    """Lit le fichier de profils."""
+    base_dir = os.path.dirname(os.path.abspath(path))
+    with open(path, "r") as f:
+        entries = json.load(f)
+    profiles = []
+    for entry in entries:
+        profiles.append(Profile(
+            name=entry['name'],
+            artists=_load_list(base_dir, entry.get('artists')),
+            podcasts=_load_list(base_dir, entry.get('podcasts')),
+            email_to=entry['email_to'],
+            refresh_token_env=entry.get('refresh_token_env', DEFAULT_REFRESH_TOKEN_ENV),
+        ))
+    names = [profile.name for profile in profiles]
+    if len(set(names)) != len(names):
+        raise ValueError(f"noms de profils en double dans {path}")
+    return profiles
+
+
+def unique_by_id(lists):
+    """Fusionne des listes d'artistes / de podcasts sans doublon d'ID (ordre de première apparition)."""
+    merged = {}
+    for items in lists:
+        for item in items:
+            merged.setdefault(item.get('id'), item)
+    return list(merged.values())
@@ -0,0 +1,105 @@
+"""
+Recommandations locales pour la section « Découvertes », sans l'endpoint
+`recommendations` de Spotify (restreint pour beaucoup d'applications).
+
+Le bot mémorise chaque semaine les artistes co-crédités sur les pistes des
+nouvelles sorties (featurings, collaborations). Ces co-crédits forment un
+graphe d'artistes, pondéré par l'ancienneté de la sortie (demi-vie
+HALF_LIFE_DAYS), gardé en tableaux NumPy (format COO : une case par lien).
+
+Pour un profil, le goût de la semaine est un vecteur sur les artistes : ceux
+qui ont sorti quelque chose, plus, avec un poids réduit, leurs artistes liés
+(co-crédités). Chaque artiste non suivi est noté par la similarité cosinus
+entre ses liens et ce vecteur. Les pistes du graphe sont celles des artistes
+suivis, déjà envoyées : le bot propose donc, pour les artistes les mieux
+notés, un de leurs morceaux à eux pas encore passé par une playlist (voir
+get_recommendations dans app.py).
+"""
+from datetime import datetime
+
+import numpy as np
+
+HALF_LIFE_DAYS = 180     # une collaboration d'il y a 6 mois compte moitié moins
+RELATED_WEIGHT = 0.5     # poids des artistes liés aux artistes de la semaine
+
+
+class Recommender:
+    """
+    Graphe des co-crédits. `credits` : tuples (artiste suivi, ID co-crédité,
+    nom co-crédité, URI de la piste, libellé de la piste, date de sortie),
+    tels que mémorisés par le store d'état.
+    """
+
+    def __init__(self, credits, today=None):
+        today = np.datetime64((today or datetime.today()).strftime("%Y-%m-%d"), 'D')
+        links = {}
+        for artist_id, partner_id, partner_name, track_uri, _, release_date in credits:
+            links[(artist_id, partner_id, track_uri)] = (partner_name, release_date)
+
+        self._index = {}   # ID d'artiste -> ligne
+        self._names = []   # ligne -> nom d'artiste
+        self._tracks = set()
+        artists, partners, dates = [], [], []
+        for (artist_id, partner_id, track_uri), (partner_name, release_date) in links.items():
+            artists.append(self._row(artist_id, None))
+            partners.append(self._row(partner_id, partner_name))
+            self._tracks.add(track_uri)
+            dates.append(release_date or str(today))
+
+        ages = (today - np.array(dates, dtype='datetime64[D]')).astype(np.float64) if dates else np.zeros(0)
+        weight = 0.5 ** (np.maximum(ages, 0) / HALF_LIFE_DAYS)
+        # Lien symétrique : chaque co-crédit compte pour les deux artistes
+        self._rows = np.concatenate([np.array(partners, dtype=np.int64), np.array(artists, dtype=np.int64)])
+        self._cols = np.concatenate([np.array(artists, dtype=np.int64), np.array(partners, dtype=np.int64)])
+        self._weight = np.concatenate([weight, weight])
+        self._norms = np.sqrt(np.bincount(self._rows, weights=self._weight ** 2, minlength=len(self._index)))
+
+    def __len__(self):
+        """Nombre de liens (co-crédits) du graphe."""
+        return len(self._rows) // 2
+
+    def _row(self, artist_id, name):
+        row = self._index.setdefault(artist_id, len(self._index))
+        if row == len(self._names):
+            self._names.append(name)
+        elif name:
+            self._names[row] = name
+        return row
+
+    def _mask(self, ids, size):
+        mask = np.zeros(size, dtype=bool)
+        positions = [self._index[item] for item in ids if item in self._index]
+        mask[positions] = True
+        return mask
+
+    def reported(self, track_uri):
+        """True si la piste vient des sorties du graphe (déjà envoyée, ou dans la playlist de la semaine)."""
+        return track_uri in self._tracks
+
+    def recommend(self, seeds, followed, k=3):
+        """
+        Jusqu'à k artistes à découvrir, les plus proches d'abord : liste de
+        (ID, nom). `seeds` : {ID d'artiste : poids} (les artistes suivis qui ont
+        sorti quelque chose cette semaine), `followed` : IDs des artistes suivis
+        (jamais proposés).
+        """
+        n = len(self._index)
+        if not n:
+            return []
+        taste = np.zeros(n)
+        for artist_id, weight in seeds.items():
+            if artist_id in self._index:
+                taste[self._index[artist_id]] += weight
+        # Ajouter les artistes liés aux artistes de la semaine
+        taste += RELATED_WEIGHT * np.bincount(self._rows, weights=self._weight * taste[self._cols], minlength=n)
+        taste_norm = np.linalg.norm(taste)
+        if not taste_norm:
+            return []
+
+        # Similarité cosinus entre les liens de chaque artiste et le goût de la semaine
+        scores = np.bincount(self._rows, weights=self._weight * taste[self._cols], minlength=n)
+        scores /= self._norms * taste_norm
+        candidates = ~self._mask(followed, n) & (scores > 0)
+        ranked = np.flatnonzero(candidates)[np.argsort(-scores[candidates], kind='stable')][:k]
+        ids = list(self._index)
+        return [(ids[row], self._names[row]) for row in ranked]
@@ -0,0 +1,150 @@
+"""
+Détection des sorties par le flux global des nouveautés (recherche
+`tag:new` puis new-releases) au lieu d'un appel `artist_albums` par artiste.
+
+Le flux est parcouru une fois et chaque sortie est comparée à un index en
+mémoire des artistes suivis (dictionnaire par ID), sur les artistes de
+l'album mais aussi sur ceux de chaque piste : le featuring d'un artiste
+suivi sur la sortie d'un autre devient une sortie à part entière (groupe
+'appears_on', seules ses pistes sont retenues).
+
+Le flux est borné (Spotify ne pagine pas une recherche au-delà de 1000
+résultats) : les artistes jamais scannés, puis par roulement ceux dont le
+dernier scan complet date de plus de `rescan_days` jours, sont encore
+scannés un par un.
+"""
+import math
+from datetime import datetime, timedelta
+
+from releases import Release
+from scanner import discover_releases, parse_release_date
+
+FEED_QUERY = "tag:new"
+PAGE_SIZE = 50
+SEARCH_MAX_RESULTS = 1000   # au-delà, Spotify refuse l'offset
+DEFAULT_RESCAN_DAYS = 28    # chaque artiste est rescanné en entier au moins une fois par cycle
+
+
+def _pages(sp, limiter, max_results, func, *args, **kwargs):
+    """Albums d'une recherche ou de new-releases (réponses {'albums': page}), suivant les pages."""
+    page = limiter.call(func, *args, **kwargs)['albums']
+    fetched = 0
+    while page:
+        yield from page['items']
+        fetched += len(page['items'])
+        if not page.get('next') or not page['items'] or fetched >= max_results:
+            return
+        page = limiter.call(sp.next, page)['albums']
+
+
+def iter_feed(sp, limiter, market):
+    """Sorties du flux des nouveautés, sans doublon."""
+    seen = set()
+    feeds = (
+        _pages(sp, limiter, SEARCH_MAX_RESULTS, sp.search, FEED_QUERY, limit=PAGE_SIZE, type='album', market=market),
+        _pages(sp, limiter, SEARCH_MAX_RESULTS, sp.new_releases, country=market, limit=PAGE_SIZE),
+    )
+    for feed in feeds:
+        for album in feed:
+            if album and album['id'] not in seen:
+                seen.add(album['id'])
+                yield album
+
+
+def due_for_rescan(artists, store, rescan_days=DEFAULT_RESCAN_DAYS, today=None):
+    """
+    Artistes à scanner un par un : tous ceux jamais scannés en entier, puis
+    les plus anciennement scannés au-delà de `rescan_days` jours, au plus
+    len(artists) * 7 / rescan_days par run pour étaler le roulement sur le cycle.
+    """
+    if store is None:
+        return list(artists)
+    cutoff = ((today or datetime.today()) - timedelta(days=rescan_days)).isoformat(timespec='seconds')
+    never, stale = [], []
+    for artist in artists:
+        checked = store.last_checked('artist', artist['id'])
+        if checked is None:
+            never.append(artist)
+        elif checked < cutoff:
+            stale.append((checked, artist))
+    stale.sort(key=lambda item: item[0])
+    budget = math.ceil(len(artists) * 7 / rescan_days)
+    return never + [artist for _, artist in stale[:budget]]
+
+
+def feed_matches(sp, artists, since, limiter, store=None, market=None):
+    """
+    Sorties du flux dont un artiste suivi est l'artiste principal, au format
+    de discover_releases (seulement les artistes trouvés). Sans résolution des
+    pistes (donc sans les featurings) : quelques dizaines de requêtes, assez
+    peu pour relire le flux souvent (mode service).
+    """
+    watched = {artist['id']: artist for artist in artists}
+    found = {}
+    for album in iter_feed(sp, limiter, market):
+        if not album.get('release_date') or parse_release_date(album['release_date']) < since:
+            continue
+        release = Release.from_json(album)
+        for artist_id, _ in release.artists:
+            if artist_id in watched and not (store is not None and store.is_known('artist', artist_id, release.id)):
+                found.setdefault(artist_id, {}).setdefault(release.id, release)
+    return [(watched[artist_id], list(recent.values()), None) for artist_id, recent in found.items()]
+
+
+def feed_discoveries(sp, artists, since, limiter, batcher, store=None, market=None, workers=1,
+                     rescan_days=DEFAULT_RESCAN_DAYS, today=None):
+    """
+    Même résultat que discover_releases (liste de (artiste, sorties récentes,
+    erreur) dans l'ordre de `artists`), à partir du flux des nouveautés
+    complété par les scans individuels des artistes dus. Les pistes des
+    sorties du flux sont résolues par `batcher`. Retourne (découvertes,
+    artistes scannés un par un sans erreur).
+    """
+    watched = {artist['id']: artist for artist in artists}
+    found = {}   # ID d'artiste suivi -> {ID d'album: Release}
+
+    def add(artist_id, release):
+        if store is not None and store.is_known('artist', artist_id, release.id):
+            return False
+        found.setdefault(artist_id, {}).setdefault(release.id, release)
+        return True
+
+    try:
+        # Seules les sorties de la semaine sont gardées, en Release (pas le JSON du flux)
+        releases = [Release.from_json(album) for album in iter_feed(sp, limiter, market)
+                    if album.get('release_date') and parse_release_date(album['release_date']) >= since]
+    except Exception as e:
+        print(f"⚠️ Flux des nouveautés indisponible, scan artiste par artiste : {e}")
+        discoveries = discover_releases(sp, artists, since, workers=workers, limiter=limiter, store=store)
+        return discoveries, [artist for artist, _, error in discoveries if not error]
+
+    # Pistes de toutes les sorties du flux, pour repérer les featurings
+    batcher.queue_albums([release.id for release in releases], full_tracks=True)
+    batcher.resolve()
+    featurings = 0
+    for release in releases:
+        main = {credit_id for credit_id, _ in release.artists}
+        try:
+            tracks = batcher.album(release.id).tracks
+        except LookupError:
+            tracks = ()
+        guests = {credit_id for track in tracks for credit_id, _ in track.artists} - main
+        for artist_id in main & watched.keys():
+            add(artist_id, release)
+        for artist_id in guests & watched.keys():
+            featurings += add(artist_id, release.as_featuring())
+
+    due = due_for_rescan(artists, store, rescan_days, today)
+    scanned = discover_releases(sp, due, since, workers=workers, limiter=limiter, store=store) if due else []
+    scan_results = {artist['id']: (recent, error) for artist, recent, error in scanned}
+    print(f"📡 Flux des nouveautés : {len(releases)} sortie(s) de la semaine, {len(found)} artiste(s) suivi(s) "
+          f"trouvé(s) dont {featurings} featuring(s), {len(due)} artiste(s) scanné(s) un par un")
+
+    discoveries = []
+    for artist in artists:
+        recent = found.get(artist['id'], {})
+        scanned_recent, error = scan_results.get(artist['id'], ([], None))
+        for release in scanned_recent:
+            recent.setdefault(release.id, release)
+        discoveries.append((artist, list(recent.values()), error))
+    return discoveries, [artist for artist, _, error in scanned if not error]
@@ -0,0 +1,120 @@
+"""
+Enregistrements compacts des sorties et des pistes, construits au fil des
+réponses Spotify à la place du JSON brut (marchés disponibles, images,
+liens...) : seuls les champs utiles au mail, à la playlist, au store d'état
+et au recommandeur sont gardés, dans des objets à `__slots__`.
+
+ReleaseDigest agrège les sorties de la semaine d'un profil en dédupliquant
+à l'ingestion : une URI par piste et une ligne de mail par album (ou par
+piste pour les singles et les featurings), quel que soit le nombre
+d'artistes suivis qui mènent à la même sortie.
+"""
+
+
+def _credits(artists):
+    """Crédits compacts : tuple de (ID, nom)."""
+    return tuple((credit.get('id'), credit.get('name')) for credit in artists)
+
+
+class Release:
+    """Sortie trouvée dans une discographie ou le flux des nouveautés (résumé d'album)."""
+    __slots__ = ('id', 'name', 'album_type', 'album_group', 'release_date', 'artists')
+
+    def __init__(self, id, name, album_type, album_group, release_date, artists):
+        self.id = id
+        self.name = name
+        self.album_type = album_type
+        self.album_group = album_group
+        self.release_date = release_date
+        self.artists = tuple(tuple(credit) for credit in artists)
+
+    @classmethod
+    def from_json(cls, album):
+        return cls(album['id'], album.get('name'), album.get('album_type'), album.get('album_group'),
+                   album.get('release_date'), _credits(album.get('artists', ())))
+
+    def as_featuring(self):
+        """La même sortie, vue comme featuring d'un artiste suivi (groupe 'appears_on')."""
+        return Release(self.id, self.name, self.album_type, 'appears_on', self.release_date, self.artists)
+
+    def to_list(self):
+        """Forme sérialisable en JSON (points de reprise) ; Release(*liste) la reconstruit."""
+        return [self.id, self.name, self.album_type, self.album_group, self.release_date, self.artists]
+
+
+class Track:
+    """Piste résolue (d'un album ou de l'endpoint `tracks`)."""
+    __slots__ = ('id', 'uri', 'name', 'url', 'artists')
+
+    def __init__(self, id, uri, name, url, artists):
+        self.id = id
+        self.uri = uri
+        self.name = name
+        self.url = url
+        self.artists = artists
+
+    @classmethod
+    def from_json(cls, track):
+        return cls(track['id'], track['uri'], track.get('name'), track.get('external_urls', {}).get('spotify'),
+                   _credits(track.get('artists', ())))
+
+    def credits(self, artist_id):
+        """True si l'artiste est crédité sur la piste."""
+        return any(credit_id == artist_id for credit_id, _ in self.artists)
+
+
+class Album:
+    """Album résolu avec toutes ses pistes."""
+    __slots__ = ('id', 'name', 'uri', 'url', 'tracks')
+
+    def __init__(self, id, name, uri, url, tracks):
+        self.id = id
+        self.name = name
+        self.uri = uri
+        self.url = url
+        self.tracks = tracks
+
+    @classmethod
+    def from_json(cls, album, tracks):
+        """`tracks` : pistes déjà converties (la pagination des pistes est suivie par l'appelant)."""
+        return cls(album['id'], album.get('name'), album.get('uri'), album.get('external_urls', {}).get('spotify'),
+                   tuple(tracks))
+
+
+class ReleaseDigest:
+    """
+    Sorties de la semaine d'un profil, dédupliquées à l'ingestion : chaque piste
+    n'est gardée qu'une fois (par ID), et un album n'a qu'une ligne dans le mail.
+    """
+
+    def __init__(self):
+        self._uris = {}    # ID de piste -> URI, dans l'ordre d'arrivée
+        self._lines = {}   # ('album' | 'track', ID) -> ligne du mail
+
+    def add(self, artist, release, album):
+        """Ajoute une sortie de `artist` : `release` (Release) et ses pistes résolues `album` (Album)."""
+        artist_name = artist['artist']
+        if release.album_group == 'appears_on':
+            # Featuring sur la sortie d'un autre artiste : seulement les pistes où il apparaît
+            main_artists = ', '.join(name for _, name in release.artists)
+            for track in album.tracks:
+                if track.credits(artist['id']):
+                    self._uris.setdefault(track.id, track.uri)
+                    self._lines.setdefault(('track', track.id), f"{main_artists} ft. {artist_name} - {track.name}")
+            return
+        for track in album.tracks:
+            self._uris.setdefault(track.id, track.uri)
+            if release.album_type != 'album':
+                self._lines.setdefault(('track', track.id), f"{artist_name} - {track.name}")
+        if release.album_type == 'album' and album.tracks:
+            self._lines.setdefault(('album', release.id), f"{artist_name} - {release.name} [Album]")
+
+    @property
+    def track_uris(self):
+        """URIs des nouvelles pistes, sans doublon, dans l'ordre des artistes."""
+        return list(self._uris.values())
+
+    @property
+    def lines(self):
+        """Lignes du mail, sans doublon."""
+        return list(self._lines.values())
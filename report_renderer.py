@@ -0,0 +1,170 @@
+"""
+Rendu du mail de la semaine : corps texte et corps HTML construits en une
+seule passe sur les données, à partir de gabarits définis une fois pour toutes
+au chargement du module (plus de concaténations `+=` ni d'échappement répété).
+"""
+import html
+
+SUBJECT = " 🎶 Sorties de la Semaine - WK{week}"
+TEXT_INTRO = "🎶 Voici les sorties Spotify de cette semaine :\n\n"
+HTML_INTRO = "<html><body><h3> 🍝 Au menu cette semaine</h3>"
+HTML_OUTRO = "</body></html>"
+
+LINE_TEXT = "{0}\n"
+LINE_HTML = "<li>{0}</li>"
+RUN_LINE_HTML = "{0}<br>"
+
+PLAYLIST_TEXT = "\n🔗 Playlist de la semaine : {url}\n"
+PLAYLIST_HTML = (
+    "<p style=\"margin-top:15px; padding:12px; background-color:#1DB954; border-radius:8px; text-align:center;\">"
+    "<a href=\"{url}\" target=\"_blank\" style=\"text-decoration:none; color:white; font-weight:bold; "
+    "font-size:1em;\">🎧 Écouter la playlist de la semaine</a></p>")
+
+PODCAST_TEXT = "{0} - {1}\n"
+PODCAST_HTML = "<li><strong>{0}</strong> - {1}</li>"
+
+CLASSIC_TEXT = "• {artist} - {album} ({year})\n  {url}\n"
+CLASSIC_HTML = (
+    "<div style=\"margin-bottom:20px; padding:15px; background-color:#f8f8f8; border-left:4px solid #1DB954;\">"
+    "<strong style=\"font-size:1.1em;\">{artist}</strong> - <em>{album}</em> ({year})<br>"
+    "<a href=\"{url}\" target=\"_blank\" style=\"text-decoration:none; color:#1DB954; font-size:0.9em;\">🎵 Spotify</a>")
+CLASSIC_DESCRIPTION_TEXT = "  À propos : {0}...\n"
+CLASSIC_DESCRIPTION_HTML = (
+    "<p style=\"margin-top:10px; font-size:0.9em; color:#555;\"><strong>À propos de l'artiste :</strong><br>{0}...</p>")
+CLASSIC_FACT_TEXT = "  💡 Le saviez-vous ? {0}...\n"
+CLASSIC_FACT_HTML = (
+    "<p style=\"margin-top:10px; padding:10px; background-color:#fff; border-left:3px solid #FFD700; "
+    "font-size:0.9em; color:#333;\"><strong>💡 Le saviez-vous ?</strong><br>{0}...</p>")
+RELEASE_DATE_HTML = "<p style=\"margin-top:5px; font-size:0.85em; color:#777;\">📅 Sorti le : {0}</p>"
+
+SONG_TEXT = "• {artist} - {song} ({year})\n  {url}\n"
+SONG_HTML = (
+    "<div style=\"margin-bottom:15px; padding:12px; background-color:#f8f8f8; border-left:4px solid #1DB954;\">"
+    "<strong style=\"font-size:1.05em;\">{artist}</strong> - <em>{song}</em> ({year})<br>"
+    "<a href=\"{url}\" target=\"_blank\" style=\"text-decoration:none; color:#1DB954; font-size:0.9em;\">🎵Spotify</a>")
+SONG_FACT_TEXT = "  💡 {0}...\n"
+SONG_FACT_HTML = (
+    "<p style=\"margin-top:10px; padding:8px; background-color:#fff; border-left:3px solid #FFD700; "
+    "font-size:0.85em; color:#333;\"><strong>💡 Le saviez-vous ?</strong><br>{0}...</p>")
+SONG_GENIUS_TEXT = "  📖 Genius: {0}\n"
+GENIUS_LINK_HTML = (
+    "<p style=\"margin-top:5px;\"><a href=\"{0}\" target=\"_blank\" style=\"text-decoration:none; "
+    "color:#FFD700; font-weight:bold; font-size:0.85em;\">💡Genius</a></p>")
+
+# En-têtes de section : (texte, HTML)
+MUSIC_HEADER = ("-- Musique --\n", "<h4>🎶 Musique</h4><ul>")
+PODCASTS_HEADER = ("\n-- Podcasts --\n", "<h4>🎧 Podcasts</h4><ul>")
+RECOMMENDATIONS_HEADER = (
+    "\n-- Découvertes --\n",
+    "<h4>🔍 Découvertes</h4><p style=\"font-size:0.9em; color:#666;\">3 morceaux que tu pourrais aimer basés "
+    "sur tes nouvelles sorties :</p><ul>")
+CLASSICS_HEADER = (
+    "\n-- Les Classiques Hip-Hop de la semaine --\n"
+    "3 albums incontournables du classement Rolling Stone des 200 meilleurs albums hip-hop :\n\n",
+    "<h4>📀 Les Classiques Hip-Hop de la semaine</h4>"
+    "<p style=\"font-size:0.9em; color:#666;\">3 Classiques du Hip-Hop à (ré)écouter (Rolling Stone) :</p>")
+SONGS_HEADER = (
+    "\n-- Les Sons du Siècle --\n"
+    "3 morceaux parmi les meilleurs du 21e siècle (Rolling Stone) :\n\n",
+    "<h4>🎵 Les Sons du Siècle</h4>"
+    "<p style=\"font-size:0.9em; color:#666;\">3 morceaux parmi les meilleurs du 21e siècle (Rolling Stone) :</p>")
+ERRORS_HEADER = ("\nErreurs rencontrées :\n", "<h3>Erreurs rencontrées :</h3><ul>")
+RUN_HEADER = ("\n-- Run --\n", "<p style=\"margin-top:20px; font-size:0.8em; color:#999;\">")
+
+
+def escape(text):
+    """Échappement HTML des textes venant de Spotify (& < >, comme l'ancien .replace en chaîne)."""
+    return html.escape(text, quote=False)
+
+
+class _Mail:
+    """Les deux corps du mail, remplis ensemble section par section."""
+
+    def __init__(self):
+        self.text = [TEXT_INTRO]
+        self.html = [HTML_INTRO]
+
+    def add(self, text_part, html_part):
+        self.text.append(text_part)
+        self.html.append(html_part)
+
+    def lines(self, header, lines):
+        """Section en liste à puces, lignes échappées côté HTML."""
+        self.add(*header)
+        self.text.extend([LINE_TEXT.format(line) for line in lines])
+        self.html.extend([LINE_HTML.format(escape(line)) for line in lines])
+        self.html.append("</ul>")
+
+
+def _classic(mail, classic):
+    mail.add(CLASSIC_TEXT.format_map(classic), CLASSIC_HTML.format_map(classic))
+    ginfo = classic.get('genius_info')
+    if ginfo:
+        # Texte : description puis fait marquant ; HTML : description, date, fait, lien Genius
+        if ginfo.get('description'):
+            mail.add(CLASSIC_DESCRIPTION_TEXT.format(ginfo['description'][:200]),
+                     CLASSIC_DESCRIPTION_HTML.format(ginfo['description'][:250]))
+        if ginfo.get('release_date'):
+            mail.html.append(RELEASE_DATE_HTML.format(ginfo['release_date']))
+        if ginfo.get('facts'):
+            mail.add(CLASSIC_FACT_TEXT.format(ginfo['facts'][0][:200]),
+                     CLASSIC_FACT_HTML.format(ginfo['facts'][0][:300]))
+        if ginfo.get('url'):
+            mail.html.append(GENIUS_LINK_HTML.format(ginfo['url']))
+    mail.add("\n", "</div>")
+
+
+def _song(mail, song):
+    mail.add(SONG_TEXT.format_map(song), SONG_HTML.format_map(song))
+    ginfo = song.get('genius_info')
+    if ginfo:
+        if ginfo.get('facts'):
+            mail.add(SONG_FACT_TEXT.format(ginfo['facts'][0][:150]),
+                     SONG_FACT_HTML.format(ginfo['facts'][0][:200]))
+        if ginfo.get('url'):
+            mail.add(SONG_GENIUS_TEXT.format(ginfo['url']), GENIUS_LINK_HTML.format(ginfo['url']))
+    mail.add("\n", "</div>")
+
+
+def render_report(today, music_releases, podcast_releases, recommendations, classics_of_week,
+                  songs_of_week, errors_list, playlist_url=None, run_summary=None):
+    """Construit le mail de la semaine. Retourne (sujet, corps texte, corps HTML)."""
+    mail = _Mail()
+
+    if music_releases:
+        mail.lines(MUSIC_HEADER, music_releases)
+        # Lien vers la playlist juste après les sorties musicales
+        if playlist_url:
+            mail.add(PLAYLIST_TEXT.format(url=playlist_url), PLAYLIST_HTML.format(url=playlist_url))
+
+    if podcast_releases:
+        mail.add(*PODCASTS_HEADER)
+        for show_name, episode_name in podcast_releases:
+            mail.add(PODCAST_TEXT.format(show_name, episode_name),
+                     PODCAST_HTML.format(escape(show_name), escape(episode_name)))
+        mail.html.append("</ul>")
+
+    if recommendations:
+        mail.lines(RECOMMENDATIONS_HEADER, recommendations)
+
+    if classics_of_week:
+        mail.add(*CLASSICS_HEADER)
+        for classic in classics_of_week:
+            _classic(mail, classic)
+
+    if songs_of_week:
+        mail.add(*SONGS_HEADER)
+        for song in songs_of_week:
+            _song(mail, song)
+
+    if errors_list:
+        mail.lines(ERRORS_HEADER, errors_list)
+
+    if run_summary:
+        mail.add(*RUN_HEADER)
+        for line in run_summary:
+            mail.add(LINE_TEXT.format(line), RUN_LINE_HTML.format(escape(line)))
+        mail.html.append("</p>")
+
+    mail.html.append(HTML_OUTRO)
+    return SUBJECT.format(week=today.isocalendar()[1]), "".join(mail.text), "".join(mail.html)
@@ -0,0 +1,149 @@
+"""
+Rotation sans répétition des catalogues tirés chaque semaine : chaque
+catalogue est parcouru dans un ordre mélangé, et aucune entrée ne revient
+avant que toutes les autres soient sorties. Le cycle suivant est remélangé.
+
+L'ordre mélangé n'est jamais stocké : c'est une permutation pseudo-aléatoire
+de [0, taille) calculée à la demande (réseau de Feistel à clé + cycle
+walking). Par catalogue, le store ne garde que la graine du cycle et le
+curseur : mémoire constante et O(1) par tirage, quelle que soit la taille.
+
+Les tirages des semaines suivantes sont donc connus à l'avance (`peek`),
+ce qui permet de préparer leurs données Genius la veille (`app.py --warm`).
+"""
+import hashlib
+import random
+import sqlite3
+from pathlib import Path
+
+from state_store import DEFAULT_STATE_PATH
+
+ROUNDS = 4
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rotations (
+    name TEXT PRIMARY KEY,         -- nom du catalogue
+    size INTEGER NOT NULL,         -- taille du catalogue pour ce cycle
+    seed INTEGER NOT NULL,         -- graine de la permutation du cycle en cours
+    cursor INTEGER NOT NULL        -- nombre d'entrées déjà tirées dans ce cycle
+);
+"""
+
+
+def permute(index, size, seed):
+    """Image de `index` par la permutation de [0, size) associée à `seed`."""
+    half_bits = max(1, ((size - 1).bit_length() + 1) // 2)
+    mask = (1 << half_bits) - 1
+    key = seed.to_bytes(8, 'big')
+    x = index
+    while True:
+        # Feistel sur 2 * half_bits bits (domaine < 4 * size), puis cycle walking
+        # jusqu'à retomber dans [0, size) : moins de 4 tours en moyenne
+        left, right = x >> half_bits, x & mask
+        for round_index in range(ROUNDS):
+            digest = hashlib.blake2b(f"{round_index}:{right}".encode(), key=key, digest_size=8).digest()
+            left, right = right, left ^ (int.from_bytes(digest, 'big') & mask)
+        x = (left << half_bits) | right
+        if x < size:
+            return x
+
+
+def next_seed(seed):
+    """Graine du cycle suivant, dérivée de la précédente (les cycles futurs restent prévisibles)."""
+    digest = hashlib.blake2b(seed.to_bytes(8, 'big'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') >> 1   # 63 bits : tient dans un INTEGER SQLite
+
+
+class Rotation:
+    """
+    Curseurs de rotation, rangés dans le store d'état. Les tirages avancent
+    les curseurs en mémoire ; commit() les écrit (seulement pour un run qui a
+    envoyé son mail, comme les sorties signalées). Avec `persist=False`
+    (dry-run, hors-ligne), le store est lu s'il existe mais jamais créé ni
+    modifié : les graines des nouveaux cycles restent en mémoire.
+    """
+
+    def __init__(self, path=DEFAULT_STATE_PATH, persist=True):
+        self.path = path
+        self.persist = persist
+        self._cursors = {}
+        self._dirty = set()
+        if persist:
+            self._db = sqlite3.connect(path)
+            self._db.executescript(SCHEMA)
+        else:
+            try:
+                self._db = sqlite3.connect(f"{Path(path).absolute().as_uri()}?mode=ro", uri=True)
+                self._db.execute("SELECT 1 FROM rotations LIMIT 1")
+            except sqlite3.Error:
+                # Pas encore de store (ou de table `rotations`) : tout part de zéro, en mémoire
+                self._db = None
+                return
+        self._cursors = {name: (size, seed, cursor) for name, size, seed, cursor
+                         in self._db.execute("SELECT name, size, seed, cursor FROM rotations")}
+
+    def _cursor(self, name, size):
+        """
+        (graine, curseur) du catalogue ; nouveau cycle si le catalogue est nouveau
+        ou a changé de taille. La graine d'un nouveau cycle est écrite tout de
+        suite (elle ne consomme aucun tirage) : un `peek` la veille et le run du
+        lendemain voient le même ordre.
+        """
+        state = self._cursors.get(name)
+        if state is None or state[0] != size:
+            state = (size, random.getrandbits(63), 0)
+            self._cursors[name] = state
+            if not self.persist:
+                return state[1], state[2]
+            with self._db:
+                self._db.execute("INSERT OR REPLACE INTO rotations (name, size, seed, cursor) VALUES (?, ?, ?, ?)",
+                                 (name, *state))
+        return state[1], state[2]
+
+    def _draw(self, size, seed, cursor, k):
+        """Tire k positions distinctes depuis (graine, curseur) ; retourne (positions, graine, curseur)."""
+        positions = []
+        while len(positions) < k:
+            if cursor == size:
+                seed, cursor = next_seed(seed), 0
+            position = permute(cursor, size, seed)
+            cursor += 1
+            # À cheval sur deux cycles, une entrée de fin de cycle peut revenir en début du suivant
+            if position not in positions:
+                positions.append(position)
+        return positions, seed, cursor
+
+    def take(self, name, size, k):
+        """Positions des k prochaines entrées du catalogue (liste vide s'il en a moins de k)."""
+        if size < k:
+            return []
+        seed, cursor = self._cursor(name, size)
+        positions, seed, cursor = self._draw(size, seed, cursor, k)
+        self._cursors[name] = (size, seed, cursor)
+        self._dirty.add(name)
+        return positions
+
+    def peek(self, name, size, k, weeks=1):
+        """Tirages des `weeks` prochains runs, sans avancer le curseur : liste de listes de positions."""
+        if size < k:
+            return []
+        seed, cursor = self._cursor(name, size)
+        draws = []
+        for _ in range(weeks):
+            positions, seed, cursor = self._draw(size, seed, cursor, k)
+            draws.append(positions)
+        return draws
+
+    def commit(self):
+        """Écrit les curseurs modifiés (une seule transaction)."""
+        if not self.persist:
+            return
+        with self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO rotations (name, size, seed, cursor) VALUES (?, ?, ?, ?)",
+                [(name, *self._cursors[name]) for name in sorted(self._dirty)])
+        self._dirty.clear()
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
@@ -0,0 +1,238 @@
+"""
+Scan des nouvelles sorties des artistes suivis, en parallèle sur un pool de
+threads borné, avec une horloge de backoff commune pour les 429 de Spotify.
+"""
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from batching import SpotifyBatcher
+from releases import Release, ReleaseDigest
+
+DEFAULT_WORKERS = 8          # taille du pool de threads pour le scan des artistes
+DEFAULT_MAX_RETRIES = 5      # nombre de nouvelles tentatives après un 429
+DEFAULT_RETRY_AFTER = 1.0    # attente (s) si Spotify ne renvoie pas de Retry-After
+ALBUM_GROUPS = ('album', 'single', 'appears_on', 'compilation')  # ordre des groupes renvoyés par Spotify
+
+
+class RateLimiter:
+    """
+    Horloge de backoff partagée entre tous les workers du scan.
+    Quand un appel reçoit un 429, tout le pool attend la durée indiquée par
+    le header Retry-After avant d'envoyer la requête suivante.
+    """
+
+    def __init__(self, max_retries=DEFAULT_MAX_RETRIES, default_wait=DEFAULT_RETRY_AFTER):
+        self.max_retries = max_retries
+        self.default_wait = default_wait
+        self.throttled = 0        # nombre de 429 reçus pendant le run
+        self.calls = Counter()    # nombre de requêtes envoyées par endpoint
+        self._resume_at = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """Bloque tant que l'horloge partagée est en pause."""
+        while True:
+            with self._lock:
+                delay = self._resume_at - time.monotonic()
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+    def backoff(self, seconds):
+        """Met tout le pool en pause pendant `seconds` secondes."""
+        with self._lock:
+            self.throttled += 1
+            self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+
+    def call(self, func, *args, **kwargs):
+        """Appelle `func` en respectant l'horloge partagée et en rejouant les 429."""
+        for attempt in range(self.max_retries + 1):
+            self.wait()
+            with self._lock:
+                self.calls[func.__name__] += 1
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                # SpotifyException porte le statut HTTP et les headers de la réponse
+                if getattr(e, 'http_status', None) != 429 or attempt == self.max_retries:
+                    raise
+                self.backoff(self._retry_after(e))
+
+    def _retry_after(self, error):
+        try:
+            return float((error.headers or {}).get('Retry-After'))
+        except (TypeError, ValueError):
+            return self.default_wait
+
+
+def parse_release_date(release_date):
+    """Convertit une date Spotify ('YYYY-MM-DD' ou 'YYYY') en datetime."""
+    if len(release_date) == 10:
+        return datetime.strptime(release_date, "%Y-%m-%d")
+    return datetime.strptime(release_date, "%Y")
+
+
+def iter_pages(sp, limiter, page):
+    """Parcourt paresseusement une réponse paginée : la page suivante n'est demandée que si on la consomme."""
+    while page:
+        yield from page['items']
+        page = limiter.call(sp.next, page) if page.get('next') else None
+
+
+def iter_discography(sp, artist_id, limiter, open_groups, page_size=50):
+    """
+    Parcourt paresseusement la discographie d'un artiste pour les groupes de
+    `open_groups` ('album', 'single', ...). Spotify renvoie les groupes l'un
+    après l'autre, chacun du plus récent au plus ancien.
+    L'appelant retire un groupe de `open_groups` dès qu'il atteint des sorties
+    trop anciennes : la pagination saute alors directement au groupe suivant
+    encore ouvert, et s'arrête quand il n'y en a plus, sans jamais charger tout
+    le back-catalogue.
+    """
+    groups = [group for group in ALBUM_GROUPS if group in open_groups]
+    page = limiter.call(sp.artist_albums, artist_id, include_groups=','.join(groups), limit=page_size)
+    while page:
+        for album in page['items']:
+            if not open_groups:
+                return
+            yield album
+        if not open_groups or not page.get('next') or not page['items']:
+            return
+        last_group = album_group(page['items'][-1])
+        if last_group not in groups:
+            return
+        if last_group in open_groups:
+            page = limiter.call(sp.next, page)
+            continue
+        # Groupe en cours clos : repartir directement sur les groupes suivants encore ouverts
+        remaining = [group for group in groups[groups.index(last_group) + 1:] if group in open_groups]
+        if not remaining:
+            return
+        page = limiter.call(sp.artist_albums, artist_id, include_groups=','.join(remaining), limit=page_size)
+
+
+def album_group(album):
+    """Groupe d'une sortie dans la discographie ('album', 'single', ...)."""
+    return album.get('album_group') or album['album_type']
+
+
+def scan_artist(sp, artist, since, limiter, store=None):
+    """
+    Cherche les albums et singles d'un artiste publiés depuis `since` et pas
+    encore signalés (d'après le store d'état, s'il est fourni).
+    Retourne un tuple (sorties récentes, erreur ou None), les sorties en
+    Release ; les pistes sont récupérées ensuite en bloc par le SpotifyBatcher.
+    """
+    try:
+        recent = []
+        open_groups = {'album', 'single'}
+        for album in iter_discography(sp, artist['id'], limiter, open_groups):
+            # Au premier élément déjà connu ou trop vieux, le reste du groupe l'est aussi
+            group = album_group(album)
+            if group not in open_groups:
+                continue
+            known = store is not None and store.is_known('artist', artist['id'], album['id'])
+            if known or parse_release_date(album['release_date']) < since:
+                open_groups.discard(group)
+                continue
+            recent.append(Release.from_json(album))
+    except Exception as e:
+        return [], str(e)
+    return recent, None
+
+
+def discover_releases(sp, artists, since, workers=DEFAULT_WORKERS, limiter=None, store=None):
+    """
+    Scanne tous les artistes, en parallèle si `workers` > 1.
+    Les résultats sont renvoyés dans l'ordre de `artists`, quel que soit
+    l'ordre de fin des workers, pour que le mail reste déterministe.
+    Retourne une liste de tuples (artiste, albums récents, erreur ou None).
+    """
+    limiter = limiter or RateLimiter()
+
+    def scan(artist):
+        return scan_artist(sp, artist, since, limiter, store)
+
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(scan, artists))
+    else:
+        results = [scan(artist) for artist in artists]
+    if limiter.throttled:
+        print(f"⏳ {limiter.throttled} réponse(s) 429 reçue(s) pendant le scan")
+    return [(artist, recent, error) for artist, (recent, error) in zip(artists, results)]
+
+
+def queue_releases(discoveries, batcher):
+    """Met en file du batcher tous les albums récents trouvés par discover_releases."""
+    batcher.queue_albums([release.id for _, recent, _ in discoveries for release in recent], full_tracks=True)
+
+
+def record_releases(discoveries, store):
+    """Mémorise dans le store d'état les albums signalés par ce run."""
+    for artist, recent, error in discoveries:
+        if recent:
+            store.record('artist', artist['id'], [(release.id, release.release_date) for release in recent])
+
+
+def collect_credits(discoveries, batcher):
+    """
+    Artistes co-crédités sur les pistes des sorties trouvées (featurings,
+    collaborations), pour le recommandeur local. Retourne une liste de tuples
+    (artiste suivi, ID co-crédité, nom co-crédité, URI, libellé, date de sortie).
+    """
+    credits = []
+    for artist, recent, _ in discoveries:
+        for release in recent:
+            try:
+                tracks = batcher.album(release.id).tracks
+            except LookupError:
+                continue
+            for track in tracks:
+                if release.album_group == 'appears_on' and not track.credits(artist['id']):
+                    continue
+                label = f"{', '.join(name for _, name in track.artists)} - {track.name}"
+                for partner_id, partner_name in track.artists:
+                    if partner_id and partner_id != artist['id']:
+                        credits.append((artist['id'], partner_id, partner_name, track.uri, label,
+                                        release.release_date))
+    return credits
+
+
+def collect_releases(discoveries, batcher):
+    """
+    Construit les résultats du scan une fois les albums résolus par le batcher,
+    en dédupliquant à l'ingestion (ReleaseDigest).
+    Retourne (new_tracks, music_releases, errors_list) : URIs et lignes du mail sans doublon.
+    """
+    digest = ReleaseDigest()
+    errors_list = []
+    for artist, recent, error in discoveries:
+        artist_name = artist['artist']
+        if error:
+            errors_list.append(f"{artist_name}: {error}")
+            print(f"⚠️ Erreur pour {artist_name}: {error}")
+            continue
+        try:
+            for release in recent:
+                digest.add(artist, release, batcher.album(release.id))
+        except Exception as e:
+            errors_list.append(f"{artist_name}: {str(e)}")
+            print(f"⚠️ Erreur pour {artist_name}: {e}")
+    return digest.track_uris, digest.lines, errors_list
+
+
+def scan_artists(sp, artists, since, workers=DEFAULT_WORKERS, limiter=None, batcher=None, store=None):
+    """
+    Scan complet : découverte des sorties, hydratation groupée des albums,
+    puis fusion. Retourne (new_tracks, music_releases, errors_list).
+    """
+    limiter = limiter or RateLimiter()
+    batcher = batcher or SpotifyBatcher(sp, limiter, workers=workers)
+    discoveries = discover_releases(sp, artists, since, workers=workers, limiter=limiter, store=store)
+    queue_releases(discoveries, batcher)
+    batcher.resolve()
+    return collect_releases(discoveries, batcher)
@@ -0,0 +1,197 @@
+"""
+Planification du mode service (`python app.py --daemon`) : au lieu d'un scan
+de tous les artistes le vendredi, chaque artiste est interrogé à son rythme,
+et les passages sont étalés sur toute la semaine.
+
+Le rythme d'un artiste dépend de ses sorties récentes (store d'état, sur
+HISTORY_DAYS jours) : deux passages par semaine pour un artiste calme, jusqu'à
+un toutes les 6 heures pour un artiste qui sort souvent. Un premier passage
+est placé à une phase fixe (hachage de l'ID) dans l'intervalle de l'artiste,
+si bien que les passages se répartissent uniformément ; à chaque tick, au
+plus CATCH_UP fois le débit moyen est envoyé, même après un arrêt du service.
+
+Les sorties détectées attendent le mail de la semaine dans la table
+`detections` du store d'état (les alertes immédiates sont optionnelles).
+"""
+import hashlib
+import heapq
+import json
+import math
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+from releases import Release
+from state_store import DEFAULT_STATE_PATH
+
+WEEK = 7 * 24 * 3600
+MIN_POLLS_PER_WEEK = 2     # artiste sans sortie récente : un passage tous les 3,5 jours
+MAX_POLLS_PER_WEEK = 28    # au plus un passage toutes les 6 heures
+POLLS_PER_RELEASE = 1      # passages hebdomadaires en plus par sortie récente
+HISTORY_DAYS = 30          # historique des sorties pris en compte (= rétention du store d'état)
+CATCH_UP = 2               # débit maximal d'un tick, en multiple du débit moyen
+WEEKDAYS = ('MON', 'TUE', 'WED', 'THU', 'FRI', 'SAT', 'SUN')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS polls (
+    artist_id TEXT PRIMARY KEY,
+    next_due REAL NOT NULL         -- prochain passage (timestamp Unix)
+);
+CREATE TABLE IF NOT EXISTS detections (
+    artist_id TEXT NOT NULL,
+    release_id TEXT NOT NULL,
+    release TEXT NOT NULL,         -- Release en JSON (voir releases.py)
+    detected_at REAL NOT NULL,
+    alerted INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (artist_id, release_id)
+);
+CREATE TABLE IF NOT EXISTS digests (
+    sent_at REAL NOT NULL          -- échéance du mail de la semaine envoyé
+);
+"""
+
+
+def polls_per_week(releases):
+    """Nombre de passages par semaine pour un artiste ayant `releases` sorties récentes."""
+    return min(MAX_POLLS_PER_WEEK, MIN_POLLS_PER_WEEK + POLLS_PER_RELEASE * releases)
+
+
+def _phase(artist_id):
+    """Position fixe de l'artiste dans son intervalle, dans [0, 1)."""
+    digest = hashlib.blake2b(artist_id.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') / 2 ** 64
+
+
+def last_digest_time(now, spec):
+    """Dernière échéance du mail de la semaine avant `now` (datetime). `spec` : 'FRI 07:00'."""
+    day, _, clock = spec.strip().upper().partition(' ')
+    hour, minute = (int(part) for part in (clock or "07:00").split(':'))
+    weekday = WEEKDAYS.index(day)
+    due = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    due -= timedelta(days=(now.weekday() - weekday) % 7)
+    return due if due <= now else due - timedelta(days=7)
+
+
+class PollScheduler:
+    """Prochain passage de chaque artiste suivi (table `polls` du store d'état)."""
+
+    def __init__(self, artists, path=DEFAULT_STATE_PATH, now=None):
+        self.path = path
+        self._db = sqlite3.connect(path)
+        self._db.executescript(SCHEMA)
+        self._artists = {artist['id']: artist for artist in artists}
+        self._due = dict(self._db.execute("SELECT artist_id, next_due FROM polls"))
+        self.refresh(now)
+
+    def refresh(self, now=None):
+        """Recalcule le rythme de chaque artiste depuis ses sorties récentes (à chaque mail de la semaine)."""
+        now = now or time.time()
+        cutoff = (datetime.fromtimestamp(now) - timedelta(days=HISTORY_DAYS)).strftime("%Y-%m-%d")
+        releases = dict(self._db.execute(
+            "SELECT source_id, COUNT(*) FROM seen WHERE kind = 'artist' AND release_date >= ? GROUP BY source_id",
+            (cutoff,)))
+        self._intervals = {artist_id: WEEK / polls_per_week(releases.get(artist_id, 0))
+                           for artist_id in self._artists}
+        self._heap = []
+        for artist_id, interval in self._intervals.items():
+            due = self._due.get(artist_id)
+            if due is None:
+                due = now + _phase(artist_id) * interval
+            # Un artiste devenu plus actif n'attend pas la fin de son ancien intervalle
+            self._due[artist_id] = due = min(due, now + interval)
+            self._heap.append((due, artist_id))
+        heapq.heapify(self._heap)
+
+    @property
+    def weekly_polls(self):
+        """Nombre total de passages par semaine."""
+        return sum(WEEK / interval for interval in self._intervals.values())
+
+    def interval(self, artist_id):
+        return self._intervals[artist_id]
+
+    def due(self, now, tick):
+        """
+        Artistes à interroger à ce tick (les plus en retard d'abord), au plus
+        CATCH_UP fois le débit moyen ; les suivants restent dus au tick suivant.
+        Chaque artiste retourné doit être repassé à polled().
+        """
+        budget = max(1, math.ceil(self.weekly_polls * tick / WEEK * CATCH_UP))
+        picked = []
+        while self._heap and self._heap[0][0] <= now and len(picked) < budget:
+            due, artist_id = heapq.heappop(self._heap)
+            if self._due.get(artist_id) == due:
+                picked.append(self._artists[artist_id])
+        return picked
+
+    def polled(self, artist_ids, now):
+        """Planifie le passage suivant de ces artistes, un intervalle plus tard."""
+        rows = []
+        for artist_id in artist_ids:
+            due = now + self._intervals[artist_id]
+            self._due[artist_id] = due
+            heapq.heappush(self._heap, (due, artist_id))
+            rows.append((artist_id, due))
+        with self._db:
+            self._db.executemany("INSERT OR REPLACE INTO polls (artist_id, next_due) VALUES (?, ?)", rows)
+
+    def close(self):
+        self._db.close()
+
+
+class DetectionBuffer:
+    """Sorties détectées au fil de la semaine, en attente du mail (tables `detections` et `digests`)."""
+
+    def __init__(self, path=DEFAULT_STATE_PATH):
+        self.path = path
+        self._db = sqlite3.connect(path)
+        self._db.executescript(SCHEMA)
+        self._buffered = set(self._db.execute("SELECT artist_id, release_id FROM detections"))
+
+    def add(self, discoveries, now):
+        """
+        Met en attente les sorties de discover_releases pas encore en attente.
+        Retourne la liste des nouvelles (artiste, Release).
+        """
+        new = [(artist, release) for artist, recent, _ in discoveries for release in recent
+               if (artist['id'], release.id) not in self._buffered]
+        with self._db:
+            self._db.executemany(
+                "INSERT OR IGNORE INTO detections (artist_id, release_id, release, detected_at) VALUES (?, ?, ?, ?)",
+                [(artist['id'], release.id, json.dumps(release.to_list(), ensure_ascii=False), now)
+                 for artist, release in new])
+        self._buffered.update((artist['id'], release.id) for artist, release in new)
+        return new
+
+    def discoveries(self, artists, until):
+        """Sorties détectées jusqu'à `until`, au format de discover_releases (dans l'ordre de `artists`)."""
+        recent = {}
+        for artist_id, release in self._db.execute(
+                "SELECT artist_id, release FROM detections WHERE detected_at <= ? ORDER BY detected_at", (until,)):
+            recent.setdefault(artist_id, []).append(Release(*json.loads(release)))
+        return [(artist, recent[artist['id']], None) for artist in artists if artist['id'] in recent]
+
+    def unalerted(self):
+        """Sorties pas encore signalées par une alerte : liste de (ID d'artiste, Release)."""
+        return [(artist_id, Release(*json.loads(release))) for artist_id, release in self._db.execute(
+            "SELECT artist_id, release FROM detections WHERE alerted = 0 ORDER BY detected_at")]
+
+    def mark_alerted(self, keys):
+        """Marque ces sorties (ID d'artiste, ID de sortie) comme signalées."""
+        with self._db:
+            self._db.executemany("UPDATE detections SET alerted = 1 WHERE artist_id = ? AND release_id = ?",
+                                 list(keys))
+
+    def last_digest(self):
+        """Échéance du dernier mail de la semaine envoyé (timestamp), ou None."""
+        return self._db.execute("SELECT MAX(sent_at) FROM digests").fetchone()[0]
+
+    def digest_sent(self, until):
+        """Le mail de l'échéance `until` est parti : ses sorties sont mémorisées par le store d'état."""
+        with self._db:
+            self._db.execute("DELETE FROM detections WHERE detected_at <= ?", (until,))
+            self._db.execute("INSERT INTO digests (sent_at) VALUES (?)", (until,))
+        self._buffered = set(self._db.execute("SELECT artist_id, release_id FROM detections"))
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,187 @@
+"""
+Mémoire persistante entre deux runs : albums déjà signalés par artiste,
+épisodes déjà signalés par podcast, date du dernier scan complet par source,
+et artistes co-crédités sur les sorties (pour le recommandeur local).
+
+Permet de lancer le bot tous les jours sans renvoyer les mêmes sorties, et
+d'arrêter la lecture d'une discographie dès qu'on retombe sur du connu.
+
+Compaction (à lancer de temps en temps, ou depuis le workflow) :
+    python state_store.py compact --retention-days 30 --keep 50
+"""
+import argparse
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+DEFAULT_STATE_PATH = os.getenv("STATE_PATH", ".state-spotify.db")  # à côté de .cache-spotify
+DEFAULT_RETENTION_DAYS = 30   # doit rester > fenêtre de détection (7 jours)
+DEFAULT_KEEP = 50             # nombre max d'IDs conservés par source
+DEFAULT_CREDITS_RETENTION_DAYS = 365  # historique des co-crédits gardé pour les recommandations
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    kind TEXT NOT NULL,            -- 'artist' ou 'show'
+    source_id TEXT NOT NULL,
+    last_checked TEXT,             -- dernier scan complet de la source (voir mark_checked)
+    PRIMARY KEY (kind, source_id)
+);
+CREATE TABLE IF NOT EXISTS seen (
+    kind TEXT NOT NULL,
+    source_id TEXT NOT NULL,
+    item_id TEXT NOT NULL,         -- ID d'album ou d'épisode
+    release_date TEXT,
+    seen_at TEXT NOT NULL,
+    PRIMARY KEY (kind, source_id, item_id)
+);
+CREATE TABLE IF NOT EXISTS credits (
+    artist_id TEXT NOT NULL,       -- artiste suivi, auteur de la sortie
+    partner_id TEXT NOT NULL,      -- artiste co-crédité sur une piste
+    partner_name TEXT,
+    track_uri TEXT NOT NULL,
+    label TEXT NOT NULL,           -- 'Artistes - Titre', tel qu'affiché dans le mail
+    release_date TEXT,
+    PRIMARY KEY (artist_id, partner_id, track_uri)
+);
+"""
+
+
+class StateStore:
+    """
+    Store SQLite chargé en mémoire à l'ouverture : les lectures (is_known,
+    last_checked) peuvent se faire depuis les workers du scan, les écritures
+    sont bufferisées et écrites d'un bloc par commit() en fin de run.
+    """
+
+    def __init__(self, path=DEFAULT_STATE_PATH):
+        self.path = path
+        self._db = sqlite3.connect(path)
+        self._db.executescript(SCHEMA)
+        self._seen = {}        # (kind, source_id) -> {item_id, ...}
+        self._checked = {}     # (kind, source_id) -> date du dernier scan complet
+        self._pending = []
+        self._pending_credits = []
+        self._pending_checked = []
+        self._lock = threading.Lock()
+        for kind, source_id, item_id in self._db.execute("SELECT kind, source_id, item_id FROM seen"):
+            self._seen.setdefault((kind, source_id), set()).add(item_id)
+        for kind, source_id, last_checked in self._db.execute(
+                "SELECT kind, source_id, last_checked FROM sources"):
+            self._checked[(kind, source_id)] = last_checked
+
+    # ----- Lecture -----
+    def is_known(self, kind, source_id, item_id):
+        """True si l'élément a déjà été signalé lors d'un run précédent."""
+        return item_id in self._seen.get((kind, source_id), ())
+
+    def last_checked(self, kind, source_id):
+        """Date (ISO) du dernier run qui a scanné cette source en entier, ou None."""
+        return self._checked.get((kind, source_id))
+
+    def credits(self):
+        """Co-crédits mémorisés : tuples (artiste, ID co-crédité, nom, URI, libellé, date de sortie)."""
+        return self._db.execute(
+            "SELECT artist_id, partner_id, partner_name, track_uri, label, release_date FROM credits").fetchall()
+
+    # ----- Écriture -----
+    def record(self, kind, source_id, items):
+        """Mémorise des éléments signalés : liste de tuples (item_id, release_date)."""
+        with self._lock:
+            self._pending.append((kind, source_id, list(items)))
+
+    def record_credits(self, credits):
+        """Mémorise des co-crédits (mêmes tuples que credits())."""
+        with self._lock:
+            self._pending_credits.extend(credits)
+
+    def mark_checked(self, kind, source_ids):
+        """Mémorise que ces sources ont été scannées en entier par ce run (même sans sortie)."""
+        with self._lock:
+            self._pending_checked.extend((kind, source_id) for source_id in source_ids)
+
+    def pending(self):
+        """Écritures en attente du commit, sérialisables en JSON (pour un point de reprise)."""
+        with self._lock:
+            return {'seen': list(self._pending), 'credits': list(self._pending_credits),
+                    'checked': list(self._pending_checked)}
+
+    def restore(self, pending):
+        """Reprend les écritures en attente d'un run interrompu (voir pending())."""
+        with self._lock:
+            self._pending.extend(pending['seen'])
+            self._pending_credits.extend(pending['credits'])
+            self._pending_checked.extend(pending['checked'])
+
+    def commit(self):
+        """Écrit les éléments mémorisés (une seule transaction)."""
+        now = datetime.now().isoformat(timespec='seconds')
+        with self._lock:
+            pending, self._pending = self._pending, []
+            credits, self._pending_credits = self._pending_credits, []
+            checked, self._pending_checked = self._pending_checked, []
+        with self._db:
+            for kind, source_id in checked:
+                self._db.execute(
+                    "INSERT INTO sources (kind, source_id, last_checked) VALUES (?, ?, ?) "
+                    "ON CONFLICT (kind, source_id) DO UPDATE SET last_checked = excluded.last_checked",
+                    (kind, source_id, now))
+                self._checked[(kind, source_id)] = now
+            self._db.executemany(
+                "INSERT OR REPLACE INTO credits (artist_id, partner_id, partner_name, track_uri, label, release_date) "
+                "VALUES (?, ?, ?, ?, ?, ?)", credits)
+            for kind, source_id, items in pending:
+                for item_id, release_date in items:
+                    self._db.execute(
+                        "INSERT OR IGNORE INTO seen (kind, source_id, item_id, release_date, seen_at) "
+                        "VALUES (?, ?, ?, ?, ?)", (kind, source_id, item_id, release_date, now))
+                    self._seen.setdefault((kind, source_id), set()).add(item_id)
+
+    def compact(self, retention_days=DEFAULT_RETENTION_DAYS, keep=DEFAULT_KEEP,
+                credits_retention_days=DEFAULT_CREDITS_RETENTION_DAYS):
+        """
+        Borne la taille du store : supprime les éléments sortis il y a plus de
+        `retention_days` jours (déjà exclus par la fenêtre de détection) et ne
+        garde que les `keep` plus récents par source.
+        Les co-crédits sont gardés `credits_retention_days` jours.
+        Retourne le nombre de lignes supprimées.
+        """
+        cutoff = (datetime.today() - timedelta(days=retention_days)).strftime("%Y-%m-%d")
+        credits_cutoff = (datetime.today() - timedelta(days=credits_retention_days)).strftime("%Y-%m-%d")
+        with self._db:
+            removed = self._db.execute("DELETE FROM seen WHERE release_date < ?", (cutoff,)).rowcount
+            removed += self._db.execute("DELETE FROM credits WHERE release_date < ?", (credits_cutoff,)).rowcount
+            removed += self._db.execute(
+                "DELETE FROM seen WHERE rowid IN ("
+                "  SELECT rowid FROM ("
+                "    SELECT rowid, ROW_NUMBER() OVER ("
+                "      PARTITION BY kind, source_id ORDER BY release_date DESC, seen_at DESC) AS rank"
+                "    FROM seen)"
+                "  WHERE rank > ?)", (keep,)).rowcount
+        self._db.execute("VACUUM")
+        return removed
+
+    def close(self):
+        self._db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintenance du store d'état du bot")
+    sub = parser.add_subparsers(dest='command', required=True)
+    compact = sub.add_parser('compact', help="supprimer les entrées anciennes pour borner le store")
+    compact.add_argument('--path', default=DEFAULT_STATE_PATH)
+    compact.add_argument('--retention-days', type=int, default=DEFAULT_RETENTION_DAYS)
+    compact.add_argument('--keep', type=int, default=DEFAULT_KEEP)
+    compact.add_argument('--credits-retention-days', type=int, default=DEFAULT_CREDITS_RETENTION_DAYS)
+    args = parser.parse_args()
+
+    if args.command == 'compact':
+        store = StateStore(args.path)
+        removed = store.compact(retention_days=args.retention_days, keep=args.keep,
+                                credits_retention_days=args.credits_retention_days)
+        store.close()
+        print(f"✅ Store compacté : {removed} entrée(s) supprimée(s) ({args.path})")
+
+
+if __name__ == '__main__':
+    main()